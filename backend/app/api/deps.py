@@ -50,3 +50,13 @@ def get_current_user(
     # In a real DB auth, we would fetch the user object here
     return token_data.sub
 
+def get_current_admin_user(
+    current_user: str = Depends(get_current_user)
+) -> str:
+    """Usuário autenticado que também é o administrador (ADMIN_USER); senão 403."""
+    if current_user != settings.ADMIN_USER:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Acesso restrito ao administrador",
+        )
+    return current_user
@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.v1.endpoints import auth, projects, dashboard, movements, validation, reports, ofx, faturamento
+from app.api.v1.endpoints import auth, projects, dashboard, movements, validation, reports, ofx, faturamento, sync
 
 api_router = APIRouter()
 api_router.include_router(auth.router, prefix="/auth", tags=["auth"])
@@ -10,4 +10,5 @@ api_router.include_router(validation.router, prefix="/validation", tags=["valida
 api_router.include_router(reports.router, prefix="/reports", tags=["reports"])
 api_router.include_router(ofx.router, prefix="/ofx", tags=["ofx"])
 api_router.include_router(faturamento.router, prefix="/faturamento", tags=["faturamento"])
+api_router.include_router(sync.router, prefix="/sync", tags=["sync"])
 
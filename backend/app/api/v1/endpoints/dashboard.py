@@ -1,9 +1,10 @@
-from typing import Any, Dict, Optional
-from fastapi import APIRouter, Depends, Response
+from typing import Any, Dict, List, Optional
+from fastapi import APIRouter, Depends, Request
 from sqlalchemy.orm import Session
 from app.api import deps
 from app.services.dashboard_service import DashboardService
-from app.core.cache import cache
+from app.core.cache import cache, table_tag, custo_tag
+from app.core.http_cache import json_response
 
 router = APIRouter()
 
@@ -12,21 +13,49 @@ CACHE_TTL = 120
 
 @router.delete("/cache/clear")
 def clear_dashboard_cache(
-    current_user: str = Depends(deps.get_current_user),
+    current_user: str = Depends(deps.get_current_admin_user),
+    table: Optional[str] = None,
+    custo: Optional[str] = None,
 ) -> Dict[str, Any]:
     """
     Limpa o cache do dashboard.
     Útil quando dados foram atualizados e precisam ser recalculados.
+    Com table (ex.: SE2010) e/ou custo, remove só as entradas que dependem desses dados.
     """
-    cache.cleanup_expired()
+    tags = ([table_tag(table.upper())] if table else []) + ([custo_tag(custo)] if custo else [])
+    if tags:
+        removed = cache.invalidate_tags(*tags)
+    else:
+        removed = cache.stats()["entries"]
+        cache.clear()
     return {
         "message": "Cache do dashboard limpo com sucesso",
-        "status": "success"
+        "status": "success",
+        "removed": removed
     }
 
+@router.get("/cache/stats")
+def get_cache_stats(
+    current_user: str = Depends(deps.get_current_admin_user),
+) -> Dict[str, Any]:
+    """
+    Estatísticas do cache deste worker: entradas, bytes aproximados, hits/misses e descartes.
+    """
+    return cache.stats()
+
+@router.get("/cache/namespaces")
+def get_cache_namespace_stats(
+    current_user: str = Depends(deps.get_current_admin_user),
+) -> List[Dict[str, Any]]:
+    """
+    Estatísticas por namespace de chave (kpi_all, status_stats, dashboard_summary...):
+    entradas, bytes, hits/misses e tempo total/médio de recálculo, para ajustar os TTLs.
+    """
+    return cache.namespace_stats()
+
 @router.get("/summary", response_model=Dict[str, Any])
 def get_dashboard_summary(
-    response: Response,
+    request: Request,
     db: Session = Depends(deps.get_db),
     current_user: str = Depends(deps.get_current_user),
     start_date: Optional[str] = None,
@@ -36,17 +65,13 @@ def get_dashboard_summary(
     Get aggregated dashboard data with caching.
     Mantido para compatibilidade com frontend existente.
     """
-    result = DashboardService.get_summary(db, start_date, end_date)
-    
-    # Adiciona headers de cache HTTP
-    response.headers["X-Cache"] = "MISS"  # Serviço já gerencia cache internamente
-    response.headers["Cache-Control"] = f"public, max-age={CACHE_TTL}"
-    
-    return result
+    # JSON já serializado no cache do serviço; ETag permite responder 304 às consultas repetidas
+    payload = DashboardService.get_summary_json(db, start_date, end_date)
+    return json_response(request, payload, CACHE_TTL)
 
 @router.get("/kpis", response_model=Dict[str, Any])
 def get_dashboard_kpis(
-    response: Response,
+    request: Request,
     db: Session = Depends(deps.get_db),
     current_user: str = Depends(deps.get_current_user),
     start_date: Optional[str] = None,
@@ -56,14 +81,12 @@ def get_dashboard_kpis(
     Get only KPIs data.
     Otimizado para carregamento rápido da aba principal.
     """
-    kpis = DashboardService.get_kpis_only(db, start_date, end_date)
-    
-    response.headers["Cache-Control"] = f"public, max-age={CACHE_TTL}"
-    return kpis
+    payload = DashboardService.get_kpis_json(db, start_date, end_date)
+    return json_response(request, payload, CACHE_TTL)
 
 @router.get("/projects", response_model=Dict[str, Any])
 def get_dashboard_projects(
-    response: Response,
+    request: Request,
     db: Session = Depends(deps.get_db),
     current_user: str = Depends(deps.get_current_user),
     start_date: Optional[str] = None,
@@ -74,14 +97,12 @@ def get_dashboard_projects(
     Get only projects data (in execution and ending soon).
     Otimizado para carregamento da seção de projetos.
     """
-    projects = DashboardService.get_projects_only(db, start_date, end_date, limit)
-    
-    response.headers["Cache-Control"] = f"public, max-age={CACHE_TTL}"
-    return projects
+    payload = DashboardService.get_projects_json(db, start_date, end_date, limit)
+    return json_response(request, payload, CACHE_TTL)
 
 @router.get("/charts", response_model=Dict[str, Any])
 def get_dashboard_charts(
-    response: Response,
+    request: Request,
     db: Session = Depends(deps.get_db),
     current_user: str = Depends(deps.get_current_user),
     start_date: Optional[str] = None,
@@ -91,14 +112,12 @@ def get_dashboard_charts(
     Get only chart data.
     Otimizado para carregamento da seção de análises.
     """
-    charts = DashboardService.get_charts_only(db, start_date, end_date)
-    
-    response.headers["Cache-Control"] = f"public, max-age={CACHE_TTL}"
-    return charts
+    payload = DashboardService.get_charts_json(db, start_date, end_date)
+    return json_response(request, payload, CACHE_TTL)
 
 @router.get("/status-stats", response_model=Dict[str, int])
 def get_dashboard_status_stats(
-    response: Response,
+    request: Request,
     db: Session = Depends(deps.get_db),
     current_user: str = Depends(deps.get_current_user),
     start_date: Optional[str] = None,
@@ -108,10 +127,8 @@ def get_dashboard_status_stats(
     Get only status statistics.
     Otimizado para carregamento rápido de estatísticas.
     """
-    stats = DashboardService.get_status_stats_only(db, start_date, end_date)
-    
-    response.headers["Cache-Control"] = f"public, max-age={CACHE_TTL}"
-    return stats
+    payload = DashboardService.get_status_stats_json(db, start_date, end_date)
+    return json_response(request, payload, CACHE_TTL)
 
 @router.get("/projects-list", response_model=Dict[str, Any])
 def get_projects_list(
@@ -54,7 +54,7 @@ def read_movements(
         # Exclude records where PAD_REALIZ = 0 AND PAD_APAGAR = 0
         # Exclude records where PAD_NATURE = '0001'
         movements = db.query(PAD010)\
-            .filter(PAD010.PAD_CUSTO == custo)\
+            .filter(PAD010.PAD_CUSTO == custo.strip())\
             .filter(or_(
                 PAD010.D_E_L_E_T_.is_(None),
                 PAD010.D_E_L_E_T_ == '',
@@ -113,7 +113,7 @@ def get_expenses_by_period(
         # ============================================
         # PASSO 1: Buscar PAD_NATURE de 4 dígitos (mães) - excluindo '0001'
         pad_records = db.query(PAD010.PAD_NATURE).filter(
-            func.trim(PAD010.PAD_CUSTO) == custo_trimmed,
+            PAD010.PAD_CUSTO == custo_trimmed,
             or_(
                 PAD010.D_E_L_E_T_.is_(None),
                 PAD010.D_E_L_E_T_ == '',
@@ -145,7 +145,7 @@ def get_expenses_by_period(
             SE2010.E2_EMISSAO,
             SE2010.E2_BAIXA
         ).filter(
-            func.trim(SE2010.E2_CUSTO) == custo_trimmed,
+            SE2010.E2_CUSTO == custo_trimmed,
             or_(
                 SE2010.D_E_L_E_T_.is_(None),
                 SE2010.D_E_L_E_T_ == '',
@@ -241,7 +241,7 @@ def get_expenses_by_month(
         # ============================================
         # PASSO 1: Buscar PAD_NATURE de 4 dígitos (mães) - excluindo '0001'
         pad_records = db.query(PAD010.PAD_NATURE).filter(
-            func.trim(PAD010.PAD_CUSTO) == custo_trimmed,
+            PAD010.PAD_CUSTO == custo_trimmed,
             or_(
                 PAD010.D_E_L_E_T_.is_(None),
                 PAD010.D_E_L_E_T_ == '',
@@ -270,7 +270,7 @@ def get_expenses_by_month(
             SE2010.E2_VALOR,
             SE2010.E2_RUBRIC
         ).filter(
-            func.trim(SE2010.E2_CUSTO) == custo_trimmed,
+            SE2010.E2_CUSTO == custo_trimmed,
             or_(
                 SE2010.D_E_L_E_T_.is_(None),
                 SE2010.D_E_L_E_T_ == '',
@@ -414,7 +414,7 @@ def get_expenses_with_count(
             PAD010.PAD_NATURE,
             PAD010.PAD_DESCRI
         ).filter(
-            func.trim(PAD010.PAD_CUSTO) == custo_trimmed,
+            PAD010.PAD_CUSTO == custo_trimmed,
             or_(
                 PAD010.D_E_L_E_T_.is_(None),
                 PAD010.D_E_L_E_T_ == '',
@@ -429,7 +429,7 @@ def get_expenses_with_count(
             PAD010.PAD_NATURE,
             PAD010.PAD_DESCRI
         ).filter(
-            func.trim(PAD010.PAD_CUSTO) == custo_trimmed,
+            PAD010.PAD_CUSTO == custo_trimmed,
             or_(
                 PAD010.D_E_L_E_T_.is_(None),
                 PAD010.D_E_L_E_T_ == '',
@@ -491,7 +491,7 @@ def get_expenses_with_count(
             SE2010.E2_EMISSAO,
             SE2010.E2_BAIXA
         ).filter(
-            func.trim(SE2010.E2_CUSTO) == custo_trimmed,
+            SE2010.E2_CUSTO == custo_trimmed,
             or_(
                 SE2010.D_E_L_E_T_.is_(None),
                 SE2010.D_E_L_E_T_ == '',
@@ -774,7 +774,7 @@ def debug_movements_data(
         
         # First, check total counts
         total_pad = db.query(PAD010).filter(
-            func.trim(PAD010.PAD_CUSTO) == custo_trimmed
+            PAD010.PAD_CUSTO == custo_trimmed
         ).count()
         
         # Get PAD010 records - ALL records first to see what we have
@@ -784,7 +784,7 @@ def debug_movements_data(
             PAD010.PAD_CUSTO,
             PAD010.D_E_L_E_T_
         ).filter(
-            func.trim(PAD010.PAD_CUSTO) == custo_trimmed
+            PAD010.PAD_CUSTO == custo_trimmed
         ).limit(100).all()
         
         # Get PAD010 records with filters
@@ -793,7 +793,7 @@ def debug_movements_data(
             PAD010.PAD_DESCRI,
             PAD010.PAD_CUSTO
         ).filter(
-            func.trim(PAD010.PAD_CUSTO) == custo_trimmed,
+            PAD010.PAD_CUSTO == custo_trimmed,
             or_(
                 PAD010.D_E_L_E_T_.is_(None),
                 PAD010.D_E_L_E_T_ == '',
@@ -3,11 +3,15 @@ from datetime import datetime, timedelta
 from pydantic import BaseModel
 from fastapi import APIRouter, Depends, Query, HTTPException, UploadFile, File, Form
 from sqlalchemy.orm import Session
-from sqlalchemy import func, select, or_
+from sqlalchemy import func, select, or_, and_
 from app.api import deps
-from app.models.protheus import CTT010, PAD010, SC6010, SE2010
+from app.models.protheus import CTT010, PAD010, SC6010
 from app.models.project_status import ProjectStatus
 from app.models.base import Base
+from app.core.cache import cache, make_key, table_tag, custo_tag
+from app.core.pagination import encode_cursor, decode_cursor
+from app.services.project_search_service import ProjectSearchService
+from app.services.project_summary_service import ProjectSummaryService
 from app.schemas.project import ProjectCreate
 from app.schemas.notes import ProjectNoteCreate, ProjectNoteUpdate, ProjectNoteResponse
 from app.schemas.attachments import ProjectAttachmentResponse
@@ -22,15 +26,19 @@ router = APIRouter()
 
 def object_as_dict(obj):
     """
-    Converts an SQLAlchemy model instance into a dictionary.
+    Converts an SQLAlchemy model instance (or a row of its table's columns) into a dictionary.
     Handles potential serialization issues by ensuring values are JSON compatible if needed.
     """
     if not obj:
         return {}
     
+    if hasattr(obj, "_mapping"):
+        items = obj._mapping.items()
+    else:
+        items = ((c.key, getattr(obj, c.key)) for c in inspect(obj).mapper.column_attrs)
+    
     result = {}
-    for c in inspect(obj).mapper.column_attrs:
-        val = getattr(obj, c.key)
+    for key, val in items:
         # Handle potential bytes/binary data from legacy DBs that might break JSON
         if isinstance(val, bytes):
             try:
@@ -42,9 +50,13 @@ def object_as_dict(obj):
         if isinstance(val, str):
             val = val.strip()
             
-        result[c.key] = val
+        result[key] = val
     return result
 
+# Totals and status counters are cached so that paging through the list doesn't recount every time
+COUNT_CACHE_TTL = 120
+COUNT_CACHE_TAGS = [table_tag("CTT010"), table_tag("PROJECT_STATUS")]
+
 @router.get("/", response_model=dict)
 def read_projects(
     db: Session = Depends(deps.get_db),
@@ -58,11 +70,28 @@ def read_projects(
     status: Optional[str] = None,
     analyst: Optional[str] = None,
     show_finalized: Optional[bool] = None,
+    after: Optional[str] = None,
+    include_total: bool = True,
     current_user: str = Depends(deps.get_current_user),
 ) -> Any:
     """
     Retrieve projects (CTT010) with pagination and budget usage info.
+    Paginação por página (page) ou por cursor: passe o next_cursor da resposta em after para
+    obter a página seguinte, com o mesmo custo em qualquer ponto da lista. O total vem do
+    cache (include_total=false dispensa a contagem).
     """
+    # Keyset pagination: rows after the last (CTT_CUSTO, R_E_C_N_O_) of the previous page.
+    # CTT_CUSTO alone may repeat, and duplicates at a page boundary would be skipped.
+    after_key = decode_cursor(after) if after else None
+    if after_key is not None and not (isinstance(after_key, list) and len(after_key) == 2):
+        raise HTTPException(status_code=400, detail="Cursor de paginação inválido")
+    
+    def after_row(custo, recno):
+        return or_(
+            CTT010.CTT_CUSTO > custo,
+            and_(CTT010.CTT_CUSTO == custo, CTT010.R_E_C_N_O_ > recno)
+        )
+    
     try:
         # Calculate skip
         skip = (page - 1) * limit
@@ -70,140 +99,36 @@ def read_projects(
         # Base query
         query = db.query(CTT010)
         
-        # Apply filters
-        if search:
-            search_filter = f"%{search}%"
-            query = query.filter(
-                (CTT010.CTT_DESC01.ilike(search_filter)) | 
-                (CTT010.CTT_CUSTO.ilike(search_filter)) |
-                (CTT010.CTT_NOMECO.ilike(search_filter))
-            )
-        
-        if coordinator:
-            query = query.filter(CTT010.CTT_NOMECO.ilike(f"%{coordinator}%"))
-        
-        if client:
-            query = query.filter(CTT010.CTT_UNIDES.ilike(f"%{client}%"))
+        # Apply filters (word-prefix, accent-insensitive lookups in the search index)
+        search_clause = ProjectSearchService.filter_clause(
+            ["desc", "custo", "coord"], search, [CTT010.CTT_DESC01, CTT010.CTT_CUSTO, CTT010.CTT_NOMECO]
+        )
+        coordinator_clause = ProjectSearchService.filter_clause(["coord"], coordinator, [CTT010.CTT_NOMECO])
+        client_clause = ProjectSearchService.filter_clause(["client"], client, [CTT010.CTT_UNIDES])
+        analyst_clause = ProjectSearchService.filter_clause(
+            ["analyst"], analyst, [CTT010.CTT_ANADES, CTT010.CTT_ANALIS]
+        )
         
-        if analyst:
+        for clause in [search_clause, coordinator_clause, client_clause, analyst_clause]:
+            if clause is not None:
+                query = query.filter(clause)
+        
+        # Status pré-calculado e indexado (PROJECT_SUMMARY, construído na primeira consulta se faltar)
+        status_clause = ProjectSummaryService.status_clause(status) if status else None
+        if status_clause is not None:
+            query = query.filter(status_clause)
+        elif status == 'finished':
+            # Mantido apenas para compatibilidade: os finalizados estão em "finalized"
+            query = query.filter(False)
+        elif status == 'active':
+            # Vigentes e os que terminaram há até 60 dias
+            sixty_days_ago = (datetime.now() - timedelta(days=60)).strftime("%Y%m%d")
             query = query.filter(
-                (CTT010.CTT_ANADES.ilike(f"%{analyst}%")) |
-                (CTT010.CTT_ANALIS.ilike(f"%{analyst}%"))
+                CTT010.CTT_DTFIM >= sixty_days_ago,
+                CTT010.CTT_DTFIM != '',
+                CTT010.CTT_DTFIM != None
             )
-        
-        if status:
-            today_dt = datetime.now()
-            today = today_dt.strftime("%Y%m%d")
-            
-            # Get finalized projects to exclude from rendering_accounts
-            finalized_custos_list = []
-            try:
-                finalized_statuses = db.query(ProjectStatus.CTT_CUSTO).filter(ProjectStatus.is_finalized == True).all()
-                finalized_custos_list = [str(status.CTT_CUSTO).strip() for status in finalized_statuses if status.CTT_CUSTO]
-            except Exception as e:
-                # Se a tabela não existir, continua sem projetos finalizados
-                print(f"Aviso: Erro ao consultar projetos finalizados: {str(e)}")
-            
-            if status == 'in_execution':
-                # Em Execução: No período de vigência E não finalizado internamente
-                # O usuário solicitou que Vigência tenha prioridade sobre Encerrado ERP.
-                query = query.filter(
-                    CTT010.CTT_DTINI <= today, 
-                    CTT010.CTT_DTFIM >= today
-                )
-                # Excluir apenas os finalizados internamente (que é um status "forçado")
-                if finalized_custos_list:
-                    query = query.filter(~CTT010.CTT_CUSTO.in_(finalized_custos_list))
-
-            elif status == 'rendering_accounts':
-                # Prestar Contas: Já terminou (End < Today) E não encerrado nem finalizado
-                query = query.filter(CTT010.CTT_DTFIM < today)
-                # Excluir encerrados
-                query = query.filter(
-                    or_(
-                        CTT010.CTT_DTENC.is_(None),
-                        CTT010.CTT_DTENC == '',
-                        func.len(CTT010.CTT_DTENC) != 8,
-                        CTT010.CTT_DTENC > today
-                    )
-                )
-                # Excluir finalizados
-                if finalized_custos_list:
-                    query = query.filter(~CTT010.CTT_CUSTO.in_(finalized_custos_list))
-
-            elif status == 'rendering_accounts_60days':
-                # Prazo 60 Dias: Terminados há menos de 60 dias E não encerrados nem finalizados
-                sixty_days_ago = (today_dt - timedelta(days=60)).strftime("%Y%m%d")
-                query = query.filter(
-                    CTT010.CTT_DTFIM < today,
-                    CTT010.CTT_DTFIM >= sixty_days_ago
-                )
-                # Excluir encerrados
-                query = query.filter(
-                    or_(
-                        CTT010.CTT_DTENC.is_(None),
-                        CTT010.CTT_DTENC == '',
-                        func.len(CTT010.CTT_DTENC) != 8,
-                        CTT010.CTT_DTENC > today
-                    )
-                )
-                # Excluir finalizados
-                if finalized_custos_list:
-                    query = query.filter(~CTT010.CTT_CUSTO.in_(finalized_custos_list))
-            elif status == 'closed' or status == 'encerrado':
-                # Encerrados: Tem CTT_DTENC <= hoje E não finalizado internamente
-                # E NÃO está no período de vigência (pois vigência tem prioridade)
-                query = query.filter(
-                    CTT010.CTT_DTENC.isnot(None),
-                    CTT010.CTT_DTENC != '',
-                    func.len(CTT010.CTT_DTENC) == 8,
-                    CTT010.CTT_DTENC <= today
-                )
-                # Excluir os que ainda estão em vigência
-                query = query.filter(
-                    or_(
-                        func.trim(CTT010.CTT_DTINI) > today,
-                        func.trim(CTT010.CTT_DTFIM) < today
-                    )
-                )
-                # Excluir finalizados para não duplicar
-                if finalized_custos_list:
-                    query = query.filter(~CTT010.CTT_CUSTO.in_(finalized_custos_list))
-            elif status == 'finished':
-                # Finalizado: Removido - todos os projetos finalizados vão para "rendering_accounts"
-                # Mantido apenas para compatibilidade, mas retorna vazio
-                query = query.filter(False)  # Sempre retorna vazio
-            elif status == 'finalized':
-                # Finalizados: Projetos com is_finalized = True na tabela PROJECT_STATUS
-                try:
-                    finalized_custos = db.query(ProjectStatus.CTT_CUSTO).filter(ProjectStatus.is_finalized == True).all()
-                    finalized_custos_list = [str(status.CTT_CUSTO).strip() for status in finalized_custos if status.CTT_CUSTO]
-                    if finalized_custos_list:
-                        query = query.filter(CTT010.CTT_CUSTO.in_(finalized_custos_list))
-                    else:
-                        query = query.filter(False)  # Nenhum projeto finalizado
-                except Exception as e:
-                    # Se a tabela não existir, retorna vazio
-                    print(f"Aviso: Erro ao filtrar projetos finalizados: {str(e)}")
-                    query = query.filter(False)
-            elif status == 'active':
-                # Active + Rendering Accounts
-                # Active means: Not Finished (> 60 days past end) AND Not Future (Started) ? 
-                # User definition: "active defined by vigencia... and rendering... finished after end+60"
-                # So Active = Everything that is NOT (Finished OR Future)? 
-                # For now, we assume "Active" means "Current work + Reporting", so we might exclude future.
-                # But typically default views show upcoming too. 
-                # Let's focus on the "Finished" complaint.
-                sixty_days_ago = (today_dt - timedelta(days=60)).strftime("%Y%m%d")
-                query = query.filter(
-                    CTT010.CTT_DTFIM >= sixty_days_ago,
-                    CTT010.CTT_DTFIM != '',
-                    CTT010.CTT_DTFIM != None
-                )
-            elif status == 'all':
-                pass # Show everything
-            
-        else:
+        elif not status:
             # Default behavior: Show all projects (including those that ended)
             # Não excluir projetos finalizados - todos podem prestar contas
             # Apenas garantir que a data de fim não está vazia
@@ -246,122 +171,71 @@ def read_projects(
         # Calculate stats for the current filter set using SQL aggregation instead of fetching all rows
         # This is MUCH faster, especially with large datasets
         
-        stats_query = db.query(CTT010)
-        
-        # Re-apply all filters EXCEPT status to the stats query
-        if search:
-            stats_query = stats_query.filter(
-                (CTT010.CTT_DESC01.ilike(search_filter)) | 
-                (CTT010.CTT_CUSTO.ilike(search_filter)) |
-                (CTT010.CTT_NOMECO.ilike(search_filter))
-            )
-        if coordinator:
-            stats_query = stats_query.filter(CTT010.CTT_NOMECO.ilike(f"%{coordinator}%"))
-        if client:
-            stats_query = stats_query.filter(CTT010.CTT_UNIDES.ilike(f"%{client}%"))
+        # Re-apply all filters EXCEPT status to the stats
+        stats_filters = [
+            clause for clause in [search_clause, coordinator_clause, client_clause] if clause is not None
+        ]
         if start_date:
             d_start_stats = start_date.replace("-", "")
-            stats_query = stats_query.filter(CTT010.CTT_DTINI >= d_start_stats)
+            stats_filters.append(CTT010.CTT_DTINI >= d_start_stats)
         if end_date:
             d_end_stats = end_date.replace("-", "")
-            stats_query = stats_query.filter(CTT010.CTT_DTINI <= d_end_stats)
+            stats_filters.append(CTT010.CTT_DTINI <= d_end_stats)
         
         # Filter valid dates only (8 characters)
-        stats_query = stats_query.filter(
-            func.len(CTT010.CTT_DTINI) == 8,
-            func.len(CTT010.CTT_DTFIM) == 8
-        )
+        stats_filters.append(func.len(CTT010.CTT_DTINI) == 8)
+        stats_filters.append(func.len(CTT010.CTT_DTFIM) == 8)
         
-        # Get finalized projects (cached via ProjectStatusService)
+        # All status counters in a single scan (same buckets as the dashboard)
         from app.services.project_status_service import ProjectStatusService
-        finalized_custos = ProjectStatusService._get_finalized_custos(db)
-        
-        today_dt = datetime.now()
-        today_str = today_dt.strftime("%Y%m%d")
-        sixty_days_ago_str = (today_dt - timedelta(days=60)).strftime("%Y%m%d")
-        
-        # Calculate stats using SQL aggregation (much faster than Python loops)
-        total_count = stats_query.count()
-        
-        # In execution: start <= today <= end (WITHOUT excluding ERP closed, as requested)
-        # Excludes only internally finalized
-        in_execution_query = stats_query.filter(
-            CTT010.CTT_DTINI <= today_str,
-            CTT010.CTT_DTFIM >= today_str
-        )
-        if finalized_custos:
-             in_execution_query = in_execution_query.filter(~CTT010.CTT_CUSTO.in_(list(finalized_custos)))
-        in_execution_count = in_execution_query.count()
-        
-        # Not started: start > today
-        not_started_query = stats_query.filter(CTT010.CTT_DTINI > today_str)
-        not_started_count = not_started_query.count()
-        
-        # Rendering accounts: end < today AND not finalized AND not closed (CTT_DTENC > hoje ou vazio)
-        rendering_query = stats_query.filter(
-            CTT010.CTT_DTFIM < today_str,
-            or_(
-                CTT010.CTT_DTENC.is_(None),
-                CTT010.CTT_DTENC == '',
-                func.len(CTT010.CTT_DTENC) != 8,
-                CTT010.CTT_DTENC > today_str
-            )
+        bucket_counts = cache.get_or_compute(
+            make_key(
+                "projects_stats", search=search, coordinator=coordinator, client=client,
+                start_date=start_date, end_date=end_date
+            ),
+            lambda: ProjectStatusService.count_status_buckets(db, stats_filters),
+            ttl_seconds=COUNT_CACHE_TTL,
+            tags=COUNT_CACHE_TAGS
         )
-        rendering_projects = rendering_query.with_entities(CTT010.CTT_CUSTO).all()
-        rendering_custos = {str(p.CTT_CUSTO).strip() for p in rendering_projects if p.CTT_CUSTO}
-        non_finalized_rendering = rendering_custos - finalized_custos
-        rendering_accounts_count = len(non_finalized_rendering)
-        
-        # Rendering accounts 60 days: ended in last 60 days AND not finalized AND not closed (CTT_DTENC > hoje ou vazio)
-        rendering_60days_query = stats_query.filter(
-            CTT010.CTT_DTFIM < today_str,
-            CTT010.CTT_DTFIM >= sixty_days_ago_str,
-            or_(
-                CTT010.CTT_DTENC.is_(None),
-                CTT010.CTT_DTENC == '',
-                func.len(CTT010.CTT_DTENC) != 8,
-                CTT010.CTT_DTENC > today_str
-            )
-        )
-        rendering_60days_projects = rendering_60days_query.with_entities(CTT010.CTT_CUSTO).all()
-        rendering_60days_custos = {str(p.CTT_CUSTO).strip() for p in rendering_60days_projects if p.CTT_CUSTO}
-        non_finalized_rendering_60days = rendering_60days_custos - finalized_custos
-        rendering_accounts_60days_count = len(non_finalized_rendering_60days)
-        
-        # Finalized count
-        finalized_query = stats_query.filter(CTT010.CTT_CUSTO.in_(list(finalized_custos))) if finalized_custos else stats_query.filter(False)
-        finalized_count = finalized_query.count() if finalized_custos else 0
-        
-        # Closed count: CTT_DTENC <= today - EXCLUDING in execution and finalized
-        closed_query = stats_query.filter(
-            CTT010.CTT_DTENC.isnot(None),
-            CTT010.CTT_DTENC != '',
-            func.len(CTT010.CTT_DTENC) == 8,
-            CTT010.CTT_DTENC <= today_str,
-            or_(
-                func.trim(CTT010.CTT_DTINI) > today_str,
-                func.trim(CTT010.CTT_DTFIM) < today_str
-            )
-        )
-        if finalized_custos:
-            closed_query = closed_query.filter(~CTT010.CTT_CUSTO.in_(list(finalized_custos)))
-        closed_count = closed_query.count()
         
         stats = {
-            "total": total_count,
-            "in_execution": in_execution_count,
-            "rendering_accounts": rendering_accounts_count,
-            "rendering_accounts_60days": rendering_accounts_60days_count,
-            "not_started": not_started_count,
-            "finalized": finalized_count,
-            "closed": closed_count
+            "total": bucket_counts["total"],
+            "in_execution": bucket_counts["in_execution"],
+            "rendering_accounts": bucket_counts["rendering_accounts"],
+            "rendering_accounts_60days": bucket_counts["rendering_accounts_60days"],
+            "not_started": bucket_counts["not_started"],
+            "finalized": bucket_counts["finalized"],
+            "closed": bucket_counts["closed"]
         }
             
         # Get total count for pagination (for the main query)
-        total = query.count()
+        total = None
+        if include_total:
+            total = cache.get_or_compute(
+                make_key(
+                    "projects_total", search=search, start_date=start_date, end_date=end_date,
+                    coordinator=coordinator, client=client, status=status, analyst=analyst,
+                    show_finalized=show_finalized
+                ),
+                query.count,
+                ttl_seconds=COUNT_CACHE_TTL,
+                tags=COUNT_CACHE_TAGS
+            )
         
         # Get paginated items
-        projects = query.order_by(CTT010.CTT_CUSTO).offset(skip).limit(limit).all()
+        # Plain rows, not ORM instances: the mapper's identity is CTT_CUSTO alone, so rows
+        # sharing a custo would collapse into one object
+        page_query = query.with_entities(*CTT010.__table__.columns).order_by(CTT010.CTT_CUSTO, CTT010.R_E_C_N_O_)
+        if after_key is not None:
+            page_query = page_query.filter(after_row(*after_key))
+        else:
+            page_query = page_query.offset(skip)
+        projects = page_query.limit(limit).all()
+        
+        # Next page exists if some row sorts after the last one (an index seek, not a count)
+        last_key = [projects[-1].CTT_CUSTO, projects[-1].R_E_C_N_O_] if projects else None
+        has_more = bool(projects) and db.query(query.filter(after_row(*last_key)).exists()).scalar()
+        next_cursor = encode_cursor(last_key) if has_more else None
         
         # Optimize: Get all realized and budget values in 2 queries instead of N queries
         # Strip whitespace from custos to avoid matching issues
@@ -372,33 +246,8 @@ def read_projects(
         # Optimize: Budget is just CTT_SALINI from CTT010, no need to query PAD010
         # This will be handled in the loop below
         
-        # Get all realized amounts in one query
-        realized_dict = {}
-        if custos_list:
-            try:
-                # Realized = Sum(E2_VALOR) from SE2010 where E2_CUSTO matches
-                realized_results = db.query(
-                    SE2010.E2_CUSTO,
-                    func.sum(func.coalesce(SE2010.E2_VALOR, 0)).label('realized')
-                ).filter(
-                    SE2010.E2_CUSTO.in_(custos_list),
-                    SE2010.D_E_L_E_T_ != '*'
-                ).group_by(SE2010.E2_CUSTO).all()
-                
-                # Handle both Row objects and tuples
-                realized_dict = {}
-                for row in realized_results:
-                    try:
-                        custo = row.E2_CUSTO.strip() if hasattr(row, 'E2_CUSTO') else str(row[0]).strip()
-                        realized = float(row.realized or 0.0) if hasattr(row, 'realized') else float(row[1] or 0.0)
-                        realized_dict[custo] = realized
-                    except Exception as e:
-                        print(f"Error processing realized row: {e}, row type: {type(row)}")
-                        continue
-            except Exception as e:
-                # Se a tabela SE2010 não existir ainda, retorna dict vazio
-                print(f"Warning: SE2010 table not available: {e}")
-                realized_dict = {}
+        # Realized = Sum(E2_VALOR) per custo, read by key from PROJECT_SUMMARY
+        realized_dict = ProjectSummaryService.get_realized(db, custos_list)
         
         # Build response data using pre-fetched values
         data = []
@@ -429,7 +278,9 @@ def read_projects(
             "total": total,
             "page": page,
             "limit": limit,
-            "total_pages": (total + limit - 1) // limit,
+            "total_pages": (total + limit - 1) // limit if total is not None else None,
+            "next_cursor": next_cursor,
+            "has_more": has_more,
             "stats": stats
         }
     except Exception as e:
@@ -443,6 +294,8 @@ def read_projects(
             "page": page,
             "limit": limit,
             "total_pages": 0,
+            "next_cursor": None,
+            "has_more": False,
             "stats": {"total": 0, "in_execution": 0, "rendering_accounts": 0, "rendering_accounts_60days": 0, "not_started": 0}
         }
 
@@ -455,8 +308,9 @@ def create_project(
     """
     Create new project.
     """
+    custo = project_in.custo.strip()  # Keys are stored trimmed
     # Check if exists
-    existing = db.query(CTT010).filter(CTT010.CTT_CUSTO == project_in.custo).first()
+    existing = db.query(CTT010).filter(CTT010.CTT_CUSTO == custo).first()
     if existing:
         raise HTTPException(status_code=400, detail="Já existe um projeto com este código de custo.")
     
@@ -467,7 +321,7 @@ def create_project(
         dt_fim = project_in.data_fim.replace("-", "") if project_in.data_fim else ""
         
         db_obj = CTT010(
-            CTT_CUSTO=project_in.custo,
+            CTT_CUSTO=custo,
             CTT_DESC01=project_in.descricao,
             CTT_UNIDES=project_in.unidade,
             CTT_DTINI=dt_ini,
@@ -482,6 +336,11 @@ def create_project(
         db.add(db_obj)
         db.commit()
         db.refresh(db_obj)
+        # New project: its summary row (status) makes it visible to the status filters and counters
+        ProjectSummaryService.refresh_projects([custo])
+        ProjectSearchService.refresh_projects([custo])
+        # Cached lists, counters and dashboard aggregates read CTT010
+        cache.invalidate_tags(table_tag("CTT010"))
         return object_as_dict(db_obj)
     except Exception as e:
         db.rollback()
@@ -563,28 +422,8 @@ def read_project(
         if not custo_trimmed:
             raise HTTPException(status_code=400, detail="Código do projeto não fornecido")
         
-        # Buscar o projeto - tenta múltiplas variações devido a possíveis espaços no banco
-        project = None
-        
-        # 1. Tenta busca exata primeiro
-        project = db.query(CTT010).filter(CTT010.CTT_CUSTO == custo_decoded).first()
-        
-        # 2. Se não encontrou, tenta com o custo trimmed
-        if not project and custo_trimmed != custo_decoded:
-            project = db.query(CTT010).filter(CTT010.CTT_CUSTO == custo_trimmed).first()
-        
-        # 3. Se ainda não encontrou, tenta busca com LIKE (ignora espaços no início/fim)
-        if not project:
-            # Busca projetos que começam ou terminam com o custo (pode ter espaços)
-            candidates = db.query(CTT010).filter(
-                CTT010.CTT_CUSTO.like(f'%{custo_trimmed}%')
-            ).all()
-            
-            # Verifica se algum projeto encontrado realmente corresponde (strip no Python)
-            for candidate in candidates:
-                if candidate.CTT_CUSTO and str(candidate.CTT_CUSTO).strip() == custo_trimmed:
-                    project = candidate
-                    break
+        # CTT_CUSTO é gravado sem espaços pelo sync: busca exata, pelo índice IX_CTT010_CTT_CUSTO
+        project = db.query(CTT010).filter(CTT010.CTT_CUSTO == custo_trimmed).first()
         
         if not project:
             raise HTTPException(status_code=404, detail=f"Projeto com código '{custo_trimmed}' não encontrado")
@@ -600,18 +439,8 @@ def read_project(
     p_dict = object_as_dict(project)
     
     # Add realized amount
-    # Realized = Sum(E2_VALOR) from SE2010 where E2_CUSTO matches
-    try:
-        realized = db.query(func.sum(func.coalesce(SE2010.E2_VALOR, 0)))\
-            .filter(
-                SE2010.E2_CUSTO == project_custo,
-                SE2010.D_E_L_E_T_ != '*'
-            )\
-            .scalar() or 0.0
-    except Exception as e:
-        # Se a tabela SE2010 não existir ainda, retorna 0
-        print(f"Warning: SE2010 table not available: {e}")
-        realized = 0.0
+    # Realized = Sum(E2_VALOR) from SE2010 where E2_CUSTO matches (materialized in PROJECT_SUMMARY)
+    realized = ProjectSummaryService.get_realized(db, [project_custo]).get(project_custo, 0.0)
     
     # Add Budget from CTT010.CTT_SALINI
     budget = float(project.CTT_SALINI or 0.0)
@@ -646,6 +475,7 @@ def get_project_billing(
     Returns all billing entries with C6_PRCVEN where C6_Serie and C8_Nota are not empty.
     Also returns total_provisions (all), billed (with serie and nota), and pending (without serie or nota).
     """
+    custo = custo.strip()  # Keys are stored trimmed
     # Verificar se o projeto existe
     project = db.query(CTT010).filter(CTT010.CTT_CUSTO == custo).first()
     if not project:
@@ -1010,6 +840,7 @@ def update_project_finalization_status(
     Se is_finalized=True, marca o projeto como finalizado.
     Se is_finalized=False, marca o projeto como pendente (ainda presta contas).
     """
+    custo = custo.strip()  # Keys are stored trimmed
     # Verificar se o projeto existe
     project = db.query(CTT010).filter(CTT010.CTT_CUSTO == custo).first()
     if not project:
@@ -1038,6 +869,10 @@ def update_project_finalization_status(
         
         db.commit()
         db.refresh(project_status)
+        # Keep the project's summary row (status, finalized flag) in step
+        ProjectSummaryService.refresh_projects([custo])
+        # Finalized set, status counters and project lists depend on PROJECT_STATUS
+        cache.invalidate_tags(table_tag("PROJECT_STATUS"), custo_tag(custo))
         
         return {
             "message": "Status de finalização atualizado com sucesso",
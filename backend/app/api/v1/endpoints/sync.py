@@ -0,0 +1,33 @@
+from typing import Any, List, Optional
+from fastapi import APIRouter, Depends, Query, HTTPException
+from sqlalchemy.orm import Session
+from app.api import deps
+from app.models.sync import SyncRunHistory
+
+router = APIRouter()
+
+@router.get("/runs", response_model=List[Any])
+def list_sync_runs(
+    db: Session = Depends(deps.get_db),
+    current_user: str = Depends(deps.get_current_user),
+    table_name: Optional[str] = Query(None, description="Filtrar por tabela (ex.: SE2010)"),
+    status: Optional[str] = Query(None, description="SUCCESS ou ERROR"),
+    limit: int = Query(50, ge=1, le=500, description="Número máximo de execuções")
+) -> Any:
+    """
+    Histórico de sincronizações por tabela (mais recentes primeiro): linhas lidas/gravadas,
+    bytes, tempo de fetch/conversão/insert, retentativas e linhas por segundo.
+    """
+    try:
+        query = db.query(SyncRunHistory)
+        if table_name:
+            query = query.filter(SyncRunHistory.table_name == table_name.upper())
+        if status:
+            query = query.filter(SyncRunHistory.status == status.upper())
+        runs = query.order_by(SyncRunHistory.started_at.desc(), SyncRunHistory.id.desc()).limit(limit).all()
+        return [
+            {column.name: getattr(run, column.name) for column in SyncRunHistory.__table__.columns}
+            for run in runs
+        ]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao obter histórico de sincronização: {str(e)}")
@@ -1,13 +1,17 @@
 from typing import Any, List, Optional, Dict
 from fastapi import APIRouter, Depends, Query, HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import text, inspect, func
+from sqlalchemy import text, func
 from sqlalchemy.inspection import inspect as sqlalchemy_inspect
 from app.api import deps
 from app.models.protheus import CTT010, PAD010
-from app.db.session import engine_local, SessionLocal
+from app.db.session import SessionLocal
 from app.services.validation_service import validation_service
+from app.services.schema_catalog import schema_catalog
 from app.schemas.validation import RejectionRequest
+from app.core.cache import cache, table_tag, custo_tag
+from app.services.project_search_service import ProjectSearchService
+from app.services.project_summary_service import ProjectSummaryService
 
 router = APIRouter()
 
@@ -39,13 +43,16 @@ def get_table_model(table_name: str):
     }
     return table_map.get(table_name)
 
+def invalidate_record_cache(table_name: str, record: Any) -> None:
+    """Remove do cache as entradas do centro de custo do registro (CTT010 ou PAD010)."""
+    custo = record.CTT_CUSTO if table_name == "CTT010" else record.PAD_CUSTO
+    if custo:
+        cache.invalidate_tags(custo_tag(custo))
+
 def get_primary_key_column(table_name: str):
-    """Get the primary key column name for a table."""
-    inspector = inspect(engine_local)
-    pk_constraint = inspector.get_pk_constraint(table_name)
-    if pk_constraint and pk_constraint['constrained_columns']:
-        return pk_constraint['constrained_columns'][0]
-    return None
+    """Get the primary key column name for a table (from the schema catalog, no reflection)."""
+    schema = schema_catalog.get_local_schema(table_name)
+    return schema_catalog.primary_key(schema) if schema else None
 
 @router.get("/stats", response_model=dict)
 def get_validation_stats(
@@ -141,6 +148,8 @@ def approve_project_all(
                     validation_service.update_validation_status("PAD010", budget_id, "APPROVED", current_user)
                     approved_budgets += 1
         
+        cache.invalidate_tags(custo_tag(custo))
+        
         return {
             "message": "Projeto e registros relacionados aprovados com sucesso",
             "project_id": custo,
@@ -312,6 +321,13 @@ def update_record(
         if not record:
             raise HTTPException(status_code=404, detail="Registro não encontrado após atualização")
         
+        # Edited fields (budget, dates...) feed the dashboard aggregates and the project's status
+        if table == "CTT010":
+            ProjectSummaryService.refresh_projects([record.CTT_CUSTO])
+            ProjectSearchService.refresh_projects([record.CTT_CUSTO])
+            cache.invalidate_tags(table_tag("CTT010"))
+        invalidate_record_cache(table, record)
+        
         record_dict = object_as_dict(record)
         val_status = validation_service.get_validation_status(table, record_id)
         record_dict["validation_status"] = val_status
@@ -365,6 +381,7 @@ def approve_record(
             "APPROVED", 
             current_user
         )
+        invalidate_record_cache(table, record)
         
         return {
             "message": "Registro aprovado e migrado com sucesso",
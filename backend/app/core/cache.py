@@ -1,72 +1,695 @@
 """
-Sistema de cache em memória simples para endpoints da API.
+Sistema de cache para endpoints da API.
 Usa TTL (Time To Live) para invalidar automaticamente entradas antigas.
+O cache é limitado (número de entradas e tamanho aproximado em bytes) e descarta
+as entradas usadas há mais tempo (LRU); uma thread remove periodicamente as expiradas.
+
+Dois backends com a mesma API (get/set/delete/get_or_compute...), escolhidos por CACHE_BACKEND:
+- memory: dicionário em memória, um por processo (padrão)
+- sqlite: arquivo SQLite em modo WAL compartilhado por todos os workers do mesmo host,
+  que passam a ter um único cache quente e uma única invalidação
+
+Chaves são "namespace:hash dos parâmetros" (make_key). Cada entrada pode ter tags, como a
+tabela de origem (table_tag("SE2010")) ou o centro de custo (custo_tag("...")), e
+invalidate_tags remove exatamente as entradas que dependem de um dado alterado.
 """
-from typing import Any, Optional
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
+from collections import OrderedDict
 from datetime import datetime, timedelta
+import hashlib
+import json
+import logging
+import pickle
+import sqlite3
+import sys
 import threading
+import time
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Tags: a fixed list, or a function of the computed value (e.g. the custos listed in it)
+Tags = Union[Iterable[str], Callable[[Any], Iterable[str]], None]
+
+def make_key(namespace: str, **params: Any) -> str:
+    """Chave de cache "namespace:md5(parâmetros)"; o namespace permite invalidar por prefixo."""
+    key_string = json.dumps(params, sort_keys=True, default=str)
+    return f"{namespace}:{hashlib.md5(key_string.encode()).hexdigest()}"
+
+def key_namespace(key: str) -> str:
+    """Namespace de uma chave ("kpi_all:abc..." -> "kpi_all")."""
+    return key.split(":", 1)[0]
+
+def table_tag(table_name: str) -> str:
+    """Tag das entradas calculadas a partir de uma tabela (CTT010, SE2010, PROJECT_STATUS...)."""
+    return f"table:{table_name}"
+
+def custo_tag(custo: str) -> str:
+    """Tag das entradas que contêm dados de um centro de custo."""
+    return f"custo:{str(custo).strip()}"
+
+def estimate_size(value: Any) -> int:
+    """Tamanho aproximado de um valor em bytes (tamanho serializado)."""
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return sys.getsizeof(value)
 
 class CacheEntry:
-    """Entrada de cache com valor e timestamp de expiração."""
-    def __init__(self, value: Any, ttl_seconds: int = 60):
+    """
+    Entrada de cache com valor e timestamp de expiração.
+    Com soft_ttl_seconds, a entrada fica "velha" (stale) depois do soft TTL, mas continua
+    sendo servida até o TTL (hard) enquanto é recalculada em segundo plano.
+    """
+    def __init__(
+        self,
+        value: Any,
+        ttl_seconds: int = 60,
+        size: int = 0,
+        soft_ttl_seconds: Optional[int] = None,
+        tags: Iterable[str] = ()
+    ):
         self.value = value
         self.created_at = datetime.now()
         self.ttl = timedelta(seconds=ttl_seconds)
-    
+        self.soft_ttl = timedelta(seconds=soft_ttl_seconds) if soft_ttl_seconds is not None else None
+        self.size = size
+        self.tags = frozenset(tags)
+
     def is_expired(self) -> bool:
         """Verifica se a entrada expirou."""
         return datetime.now() - self.created_at > self.ttl
 
-class SimpleCache:
-    """Cache em memória thread-safe com TTL."""
-    
+    def is_stale(self) -> bool:
+        """Passou do soft TTL (ainda utilizável, mas deve ser recalculada)."""
+        return self.soft_ttl is not None and datetime.now() - self.created_at > self.soft_ttl
+
+class _Flight:
+    """Cálculo em andamento de uma chave (single-flight): os demais chamadores esperam o resultado."""
     def __init__(self):
-        self._cache: dict[str, CacheEntry] = {}
-        self._lock = threading.Lock()
-    
+        self.done = threading.Event()
+        self.owner = threading.get_ident()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+class CacheBackend(ABC):
+    """
+    Base dos backends de cache: contadores, single-flight, stale-while-revalidate e sweeper.
+    Cada backend implementa os métodos abstratos (_lookup, set, invalidate_tags, delete...);
+    um backend incompleto falha ao ser criado.
+    """
+
+    backend_name = "base"
+
+    def __init__(self, max_entries: int, max_bytes: int, sweep_interval_seconds: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0  # Removed to stay within max_entries/max_bytes
+        self.expirations = 0  # Removed because the TTL ran out
+        self._counter_lock = threading.Lock()
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self._sweeper: Optional[threading.Thread] = None
+        self._stop_sweeper = threading.Event()
+        self._flights: Dict[str, _Flight] = {}
+        self._flight_lock = threading.Lock()
+        # Per-namespace counters of this process: hits, misses, computes, compute_seconds
+        self._namespaces: Dict[str, Dict[str, float]] = {}
+        self._bypass = threading.local()
+
+    # --- Implemented by each backend ---
+
+    @abstractmethod
+    def _lookup(self, key: str) -> Tuple[bool, Any, bool]:
+        """(encontrado, valor, velho) de uma entrada não expirada; remove a expirada."""
+
+    @abstractmethod
+    def set(
+        self,
+        key: str,
+        value: Any,
+        ttl_seconds: int = 60,
+        soft_ttl_seconds: Optional[int] = None,
+        tags: Iterable[str] = ()
+    ) -> None:
+        """Armazena um valor no cache com TTL especificado."""
+
+    @abstractmethod
+    def invalidate_tags(self, *tags: str) -> int:
+        """Remove todas as entradas com alguma das tags. Retorna quantas removeu."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Remove uma entrada do cache."""
+
+    @abstractmethod
+    def delete_prefix(self, prefix: str) -> int:
+        """Remove todas as entradas cuja chave começa com o prefixo. Retorna quantas removeu."""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Limpa todo o cache."""
+
+    @abstractmethod
+    def cleanup_expired(self) -> int:
+        """Remove todas as entradas expiradas. Retorna quantas removeu."""
+
+    @abstractmethod
+    def _usage(self) -> Tuple[int, int]:
+        """(entradas, bytes) armazenados."""
+
+    @abstractmethod
+    def _usage_by_namespace(self) -> Dict[str, Tuple[int, int]]:
+        """(entradas, bytes) armazenados por namespace."""
+
+    # --- Shared behaviour ---
+
+    def _namespace_counters(self, key: str) -> Dict[str, float]:
+        """Contadores do namespace da chave (chamado com o _counter_lock)."""
+        namespace = key_namespace(key)
+        counters = self._namespaces.get(namespace)
+        if counters is None:
+            counters = self._namespaces[namespace] = {
+                "hits": 0, "misses": 0, "computes": 0, "compute_errors": 0, "compute_seconds": 0.0
+            }
+        return counters
+
+    def _count(self, key: str, hit: bool, expired: bool = False) -> None:
+        with self._counter_lock:
+            counters = self._namespace_counters(key)
+            if hit:
+                self.hits += 1
+                counters["hits"] += 1
+            else:
+                self.misses += 1
+                counters["misses"] += 1
+            if expired:
+                self.expirations += 1
+
+    def _record_compute(self, key: str, seconds: float, failed: bool = False) -> None:
+        with self._counter_lock:
+            counters = self._namespace_counters(key)
+            if failed:
+                counters["compute_errors"] += 1
+            else:
+                counters["computes"] += 1
+                counters["compute_seconds"] += seconds
+
+    @contextmanager
+    def bypass(self):
+        """
+        Dentro do bloco (nesta thread), get_or_compute apenas calcula, sem ler nem gravar
+        entradas: para quem guarda o resultado final em uma entrada própria, sem somar o TTL
+        das entradas internas ao seu.
+        """
+        previous = getattr(self._bypass, "active", False)
+        self._bypass.active = True
+        try:
+            yield
+        finally:
+            self._bypass.active = previous
+
     def get(self, key: str) -> Optional[Any]:
         """Obtém um valor do cache se existir e não estiver expirado."""
+        found, value, _ = self._lookup(key)
+        return value if found else None
+
+    def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Any],
+        ttl_seconds: int = 60,
+        soft_ttl_seconds: Optional[int] = None,
+        refresh: Optional[Callable[[], Any]] = None,
+        tags: Tags = None
+    ) -> Any:
+        """
+        Retorna o valor em cache ou o calcula com compute(), uma única vez por chave:
+        chamadas simultâneas para a mesma chave esperam o cálculo em andamento em vez de
+        repetir a consulta. Se compute() falhar, a exceção chega a todos que esperavam
+        e nada é armazenado.
+
+        Stale-while-revalidate: com soft_ttl_seconds, depois do soft TTL o valor antigo é
+        devolvido na hora e refresh() (ou compute()) roda em uma thread para substituí-lo;
+        só entradas além de ttl_seconds (hard TTL) fazem a requisição esperar. refresh
+        deve abrir seus próprios recursos (ex.: sessão do banco), pois roda depois que a
+        requisição terminou.
+
+        tags: lista de tags da entrada, ou função que as calcula a partir do valor.
+        """
+        if getattr(self._bypass, "active", False):
+            return compute()
+        found, value, stale = self._lookup(key)
+        if found:
+            if stale:
+                with self._flight_lock:
+                    if key not in self._flights:
+                        self._start_refresh(key, refresh or compute, ttl_seconds, soft_ttl_seconds, tags)
+            return value
+
+        with self._flight_lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            if flight.owner == threading.get_ident():
+                return compute()  # Re-entrant call from inside this key's own computation
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        return self._run_flight(key, flight, compute, ttl_seconds, soft_ttl_seconds, tags)
+
+    def _run_flight(
+        self,
+        key: str,
+        flight: _Flight,
+        compute: Callable[[], Any],
+        ttl_seconds: int,
+        soft_ttl_seconds: Optional[int],
+        tags: Tags = None
+    ) -> Any:
+        started = time.perf_counter()
+        try:
+            flight.value = compute()
+            self._record_compute(key, time.perf_counter() - started)
+            if flight.value is not None:
+                entry_tags = tags(flight.value) if callable(tags) else (tags or ())
+                self.set(key, flight.value, ttl_seconds, soft_ttl_seconds, entry_tags)
+            return flight.value
+        except BaseException as e:
+            flight.error = e
+            if flight.value is None:
+                self._record_compute(key, time.perf_counter() - started, failed=True)
+            raise
+        finally:
+            with self._flight_lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+
+    def _start_refresh(
+        self,
+        key: str,
+        compute: Callable[[], Any],
+        ttl_seconds: int,
+        soft_ttl_seconds: Optional[int],
+        tags: Tags = None
+    ) -> None:
+        """Recalcula uma entrada velha em segundo plano (chamado com o _flight_lock)."""
+        flight = self._flights[key] = _Flight()
+        flight.owner = None  # Set by the refresh thread itself
+
+        def run():
+            flight.owner = threading.get_ident()
+            try:
+                self._run_flight(key, flight, compute, ttl_seconds, soft_ttl_seconds, tags)
+            except Exception:
+                # Stale value stays until the hard TTL
+                logger.warning(f"Background refresh of cache key {key} failed", exc_info=True)
+
+        threading.Thread(target=run, name="cache-refresh", daemon=True).start()
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores para dimensionar o cache (hits/misses/descartes são deste processo)."""
+        entries, size = self._usage()
+        with self._counter_lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": self.backend_name,
+                "entries": entries,
+                "bytes": size,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
+
+    def namespace_stats(self) -> List[Dict[str, Any]]:
+        """
+        Por namespace de chave: hits/misses e tempo de cálculo (deste processo) e entradas/bytes
+        armazenados. Serve para ajustar os TTLs e achar os cálculos que valem pré-computar.
+        """
+        usage = self._usage_by_namespace()
+        with self._counter_lock:
+            counters = {
+                namespace: dict(self._namespace_counters(namespace))
+                for namespace in set(usage) | set(self._namespaces)
+            }
+        result = []
+        for namespace in sorted(counters):
+            entries, size = usage.get(namespace, (0, 0))
+            values = counters[namespace]
+            lookups = values["hits"] + values["misses"]
+            computes = values["computes"]
+            result.append({
+                "namespace": namespace,
+                "entries": entries,
+                "bytes": size,
+                "hits": values["hits"],
+                "misses": values["misses"],
+                "hit_ratio": round(values["hits"] / lookups, 4) if lookups else 0.0,
+                "computes": computes,
+                "compute_errors": values["compute_errors"],
+                "compute_seconds_total": round(values["compute_seconds"], 3),
+                "compute_seconds_avg": round(values["compute_seconds"] / computes, 3) if computes else 0.0
+            })
+        return result
+
+    def _ensure_sweeper(self) -> None:
+        """Inicia (uma vez) a thread que remove as entradas expiradas periodicamente."""
+        if self._sweeper is not None or self.sweep_interval_seconds <= 0:
+            return
+        with self._flight_lock:
+            if self._sweeper is not None:
+                return
+            def sweep():
+                while not self._stop_sweeper.wait(self.sweep_interval_seconds):
+                    try:
+                        self.cleanup_expired()
+                    except Exception as e:
+                        logger.warning(f"Cache sweep failed: {e}")
+            self._sweeper = threading.Thread(target=sweep, name="cache-sweeper", daemon=True)
+            self._sweeper.start()
+
+class SimpleCache(CacheBackend):
+    """Cache em memória thread-safe com TTL, limite de tamanho e descarte LRU."""
+
+    backend_name = "memory"
+
+    def __init__(
+        self,
+        max_entries: int = 2000,
+        max_bytes: int = 128 * 1024 * 1024,
+        sweep_interval_seconds: int = 60
+    ):
+        super().__init__(max_entries, max_bytes, sweep_interval_seconds)
+        self._cache: "OrderedDict[str, CacheEntry]" = OrderedDict()  # Least recently used first
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._tags: Dict[str, Set[str]] = {}  # tag -> keys
+
+    def _remove(self, key: str) -> None:
+        entry = self._cache.pop(key)
+        self._bytes -= entry.size
+        for tag in entry.tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def _lookup(self, key: str) -> Tuple[bool, Any, bool]:
         with self._lock:
             entry = self._cache.get(key)
             if entry is None:
-                return None
-            
+                self._count(key, hit=False)
+                return False, None, False
+
             if entry.is_expired():
                 # Remove entrada expirada
-                del self._cache[key]
-                return None
-            
-            return entry.value
-    
-    def set(self, key: str, value: Any, ttl_seconds: int = 60) -> None:
+                self._remove(key)
+                self._count(key, hit=False, expired=True)
+                return False, None, False
+
+            self._cache.move_to_end(key)
+            self._count(key, hit=True)
+            return True, entry.value, entry.is_stale()
+
+    def set(
+        self,
+        key: str,
+        value: Any,
+        ttl_seconds: int = 60,
+        soft_ttl_seconds: Optional[int] = None,
+        tags: Iterable[str] = ()
+    ) -> None:
         """Armazena um valor no cache com TTL especificado."""
+        size = estimate_size(value)  # Outside the lock: serializing large payloads takes a while
+        evicted = 0
         with self._lock:
-            self._cache[key] = CacheEntry(value, ttl_seconds)
-    
+            if key in self._cache:
+                self._remove(key)
+            if size > self.max_bytes:
+                return  # Would evict everything else and still not fit
+            entry = self._cache[key] = CacheEntry(value, ttl_seconds, size, soft_ttl_seconds, tags)
+            for tag in entry.tags:
+                self._tags.setdefault(tag, set()).add(key)
+            self._bytes += size
+            while len(self._cache) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._cache)))
+                evicted += 1
+        if evicted:
+            with self._counter_lock:
+                self.evictions += evicted
+        self._ensure_sweeper()
+
     def delete(self, key: str) -> None:
         """Remove uma entrada do cache."""
         with self._lock:
-            self._cache.pop(key, None)
-    
+            if key in self._cache:
+                self._remove(key)
+
+    def delete_prefix(self, prefix: str) -> int:
+        """Remove todas as entradas cuja chave começa com o prefixo. Retorna quantas removeu."""
+        with self._lock:
+            keys = [key for key in self._cache if key.startswith(prefix)]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def invalidate_tags(self, *tags: str) -> int:
+        """Remove todas as entradas com alguma das tags. Retorna quantas removeu."""
+        with self._lock:
+            keys = set().union(*(self._tags.get(tag, ()) for tag in tags))
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
     def clear(self) -> None:
         """Limpa todo o cache."""
         with self._lock:
             self._cache.clear()
-    
-    def cleanup_expired(self) -> None:
-        """Remove todas as entradas expiradas."""
+            self._tags.clear()
+            self._bytes = 0
+
+    def cleanup_expired(self) -> int:
+        """Remove todas as entradas expiradas. Retorna quantas removeu."""
         with self._lock:
             expired_keys = [
                 key for key, entry in self._cache.items()
                 if entry.is_expired()
             ]
             for key in expired_keys:
-                del self._cache[key]
+                self._remove(key)
+            self.expirations += len(expired_keys)
+            return len(expired_keys)
 
-# Instância global do cache
-cache = SimpleCache()
+    def _usage(self) -> Tuple[int, int]:
+        with self._lock:
+            return len(self._cache), self._bytes
+
+    def _usage_by_namespace(self) -> Dict[str, Tuple[int, int]]:
+        usage: Dict[str, Tuple[int, int]] = {}
+        with self._lock:
+            for key, entry in self._cache.items():
+                entries, size = usage.get(key_namespace(key), (0, 0))
+                usage[key_namespace(key)] = (entries + 1, size + entry.size)
+        return usage
+
+class SQLiteCache(CacheBackend):
+    """
+    Cache compartilhado entre processos em um arquivo SQLite (modo WAL: leituras não
+    bloqueiam a escrita). Os valores são gravados com pickle. Cada thread usa sua própria
+    conexão. O descarte LRU usa o último acesso, atualizado no máximo a cada
+    ACCESS_RESOLUTION segundos para não transformar toda leitura em escrita.
+    """
 
+    backend_name = "sqlite"
+    ACCESS_RESOLUTION = 30
 
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = 2000,
+        max_bytes: int = 128 * 1024 * 1024,
+        sweep_interval_seconds: int = 60
+    ):
+        super().__init__(max_entries, max_bytes, sweep_interval_seconds)
+        self.path = path
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_entries ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, "
+            "expires_at REAL NOT NULL, soft_expires_at REAL, last_access REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_cache_entries_last_access ON cache_entries (last_access)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_tags (tag TEXT NOT NULL, key TEXT NOT NULL, PRIMARY KEY (tag, key))"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_cache_tags_key ON cache_tags (key)")
+        # Evictions, expirations and deletes drop the tags of the removed entry
+        conn.execute(
+            "CREATE TRIGGER IF NOT EXISTS tr_cache_entries_delete AFTER DELETE ON cache_entries "
+            "BEGIN DELETE FROM cache_tags WHERE key = old.key; END"
+        )
 
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode: single statements commit at once, set() opens its own transaction
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=10000")
+            self._local.conn = conn
+        return conn
 
+    def _lookup(self, key: str) -> Tuple[bool, Any, bool]:
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT value, expires_at, soft_expires_at, last_access FROM cache_entries WHERE key = ?", (key,)
+        ).fetchone()
+        now = time.time()
+        if row is None:
+            self._count(key, hit=False)
+            return False, None, False
+        blob, expires_at, soft_expires_at, last_access = row
+        if expires_at < now:
+            conn.execute("DELETE FROM cache_entries WHERE key = ? AND expires_at < ?", (key, now))
+            self._count(key, hit=False, expired=True)
+            return False, None, False
+        try:
+            value = pickle.loads(blob)
+        except Exception as e:
+            logger.warning(f"Discarding unreadable cache entry {key}: {e}")
+            self.delete(key)
+            self._count(key, hit=False)
+            return False, None, False
+        if now - last_access > self.ACCESS_RESOLUTION:
+            conn.execute("UPDATE cache_entries SET last_access = ? WHERE key = ?", (now, key))
+        self._count(key, hit=True)
+        return True, value, soft_expires_at is not None and soft_expires_at < now
+
+    def set(
+        self,
+        key: str,
+        value: Any,
+        ttl_seconds: int = 60,
+        soft_ttl_seconds: Optional[int] = None,
+        tags: Iterable[str] = ()
+    ) -> None:
+        """Armazena um valor no cache com TTL especificado."""
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(blob) > self.max_bytes:
+            self.delete(key)
+            return
+        now = time.time()
+        conn = self._connect()
+        evicted = 0
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Plain DELETE + INSERT (not INSERT OR REPLACE) so the delete trigger clears the old tags
+            conn.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+            conn.execute(
+                "INSERT INTO cache_entries (key, value, size, expires_at, soft_expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, blob, len(blob), now + ttl_seconds,
+                 now + soft_ttl_seconds if soft_ttl_seconds is not None else None, now)
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO cache_tags (tag, key) VALUES (?, ?)", [(tag, key) for tag in set(tags)]
+            )
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries").fetchone()
+            if entries > self.max_entries or size > self.max_bytes:
+                for old_key, old_size in conn.execute(
+                    "SELECT key, size FROM cache_entries WHERE key <> ? ORDER BY last_access", (key,)
+                ).fetchall():
+                    if entries <= self.max_entries and size <= self.max_bytes:
+                        break
+                    conn.execute("DELETE FROM cache_entries WHERE key = ?", (old_key,))
+                    entries -= 1
+                    size -= old_size
+                    evicted += 1
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if evicted:
+            with self._counter_lock:
+                self.evictions += evicted
+        self._ensure_sweeper()
+
+    def delete(self, key: str) -> None:
+        """Remove uma entrada do cache."""
+        self._connect().execute("DELETE FROM cache_entries WHERE key = ?", (key,))
 
+    def delete_prefix(self, prefix: str) -> int:
+        """Remove todas as entradas cuja chave começa com o prefixo. Retorna quantas removeu."""
+        cursor = self._connect().execute(
+            "DELETE FROM cache_entries WHERE substr(key, 1, ?) = ?", (len(prefix), prefix)
+        )
+        return cursor.rowcount
+
+    def invalidate_tags(self, *tags: str) -> int:
+        """Remove todas as entradas com alguma das tags. Retorna quantas removeu."""
+        if not tags:
+            return 0
+        placeholders = ",".join("?" * len(tags))
+        cursor = self._connect().execute(
+            f"DELETE FROM cache_entries WHERE key IN (SELECT key FROM cache_tags WHERE tag IN ({placeholders}))",
+            tags
+        )
+        return cursor.rowcount
+
+    def clear(self) -> None:
+        """Limpa todo o cache."""
+        self._connect().execute("DELETE FROM cache_entries")
+
+    def cleanup_expired(self) -> int:
+        """Remove todas as entradas expiradas. Retorna quantas removeu."""
+        cursor = self._connect().execute("DELETE FROM cache_entries WHERE expires_at < ?", (time.time(),))
+        with self._counter_lock:
+            self.expirations += cursor.rowcount
+        return cursor.rowcount
+
+    def _usage(self) -> Tuple[int, int]:
+        entries, size = self._connect().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries"
+        ).fetchone()
+        return entries, size
+
+    def _usage_by_namespace(self) -> Dict[str, Tuple[int, int]]:
+        rows = self._connect().execute(
+            "SELECT CASE WHEN instr(key, ':') > 0 THEN substr(key, 1, instr(key, ':') - 1) ELSE key END AS namespace, "
+            "COUNT(*), SUM(size) FROM cache_entries GROUP BY namespace"
+        ).fetchall()
+        return {namespace: (entries, size) for namespace, entries, size in rows}
+
+def create_cache() -> CacheBackend:
+    """Cria o backend configurado em CACHE_BACKEND (memory ou sqlite)."""
+    limits = dict(
+        max_entries=settings.CACHE_MAX_ENTRIES,
+        max_bytes=settings.CACHE_MAX_MB * 1024 * 1024,
+        sweep_interval_seconds=settings.CACHE_SWEEP_INTERVAL_SECONDS
+    )
+    if settings.CACHE_BACKEND == "sqlite":
+        try:
+            return SQLiteCache(settings.CACHE_SQLITE_PATH, **limits)
+        except Exception as e:
+            logger.error(f"Could not open shared cache at {settings.CACHE_SQLITE_PATH}, using in-memory cache: {e}")
+    elif settings.CACHE_BACKEND != "memory":
+        logger.warning(f"Unknown CACHE_BACKEND '{settings.CACHE_BACKEND}', using in-memory cache")
+    return SimpleCache(**limits)
+
+# Instância global do cache
+cache = create_cache()
@@ -40,6 +40,37 @@ class Settings:
     # Database Audit (Auditoria)
     LOCAL_DB_NAME_AUDIT = os.getenv("LOCAL_DB_NAME_AUDIT", "SistemaMRK_Audit")
     
+    # Sync (parallel mode)
+    # Tables synced at the same time / cost-center chunks in flight per table
+    SYNC_MAX_WORKERS = int(os.getenv("SYNC_MAX_WORKERS", "3"))
+    SYNC_CHUNK_WORKERS = int(os.getenv("SYNC_CHUNK_WORKERS", "2"))
+    # Upper bound of concurrent remote queries - keep below engine_remote pool_size (5)
+    SYNC_MAX_REMOTE_CONNECTIONS = int(os.getenv("SYNC_MAX_REMOTE_CONNECTIONS", "4"))
+    # Skip cost-center chunks whose ERP fingerprint (COUNT/SUM/CHECKSUM_AGG) matches the last load.
+    # Only affects full syncs: incremental syncs always compare, it is how they catch in-place edits.
+    SYNC_SKIP_UNCHANGED_CHUNKS = os.getenv("SYNC_SKIP_UNCHANGED_CHUNKS", "true").lower() == "true"
+    
+    # Sync scheduler (runs inside the API; off by default)
+    SYNC_SCHEDULER_ENABLED = os.getenv("SYNC_SCHEDULER_ENABLED", "false").lower() == "true"
+    # TABLE=<N>m:<mode> or TABLE=daily@HH:MM:<mode>, comma separated; a table may have several policies
+    SYNC_SCHEDULE = os.getenv(
+        "SYNC_SCHEDULE",
+        "SE2010=15m:incremental,SE2010=daily@03:00:full,SC6010=60m:incremental,SE1010=60m:incremental,"
+        "CTT010=60m:full,PAD010=daily@02:00:full"
+    )
+    SYNC_SCHEDULER_TICK_SECONDS = int(os.getenv("SYNC_SCHEDULER_TICK_SECONDS", "60"))
+    SYNC_SCHEDULER_STAGGER_SECONDS = int(os.getenv("SYNC_SCHEDULER_STAGGER_SECONDS", "60"))  # Pause between due jobs
+    SYNC_SCHEDULER_INITIAL_DELAY_SECONDS = int(os.getenv("SYNC_SCHEDULER_INITIAL_DELAY_SECONDS", "30"))
+    SYNC_SCHEDULER_LOCK_TTL_SECONDS = int(os.getenv("SYNC_SCHEDULER_LOCK_TTL_SECONDS", "300"))
+    
+    # API cache: "memory" (per worker) or "sqlite" (one WAL file shared by all workers on the host)
+    CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory").lower()
+    CACHE_SQLITE_PATH = os.getenv("CACHE_SQLITE_PATH", "./api_cache.db")
+    # LRU eviction beyond these limits; expired entries swept periodically
+    CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "2000"))
+    CACHE_MAX_MB = int(os.getenv("CACHE_MAX_MB", "128"))  # Approximate (serialized size of the values)
+    CACHE_SWEEP_INTERVAL_SECONDS = int(os.getenv("CACHE_SWEEP_INTERVAL_SECONDS", "60"))
+    
     # Admin Simple Auth
     ADMIN_USER = os.getenv("ADMIN_USER", "admin")
     ADMIN_PASS = os.getenv("ADMIN_PASS", "admin")
@@ -0,0 +1,55 @@
+"""
+Respostas JSON pré-serializadas com ETag.
+
+Os endpoints com cache guardam o JSON já codificado (bytes) junto com o hash do conteúdo.
+Um acerto no cache devolve esses bytes diretamente, sem validação do response_model nem
+nova codificação, e uma requisição com If-None-Match igual ao ETag recebe 304 sem corpo.
+"""
+from typing import Any, Dict, Optional
+import hashlib
+import json
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+class CachedJSON:
+    """Corpo JSON codificado e seu ETag (hash do conteúdo)."""
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.etag = f'"{hashlib.md5(body).hexdigest()}"'
+
+    @classmethod
+    def encode(cls, value: Any) -> "CachedJSON":
+        """Codifica como o JSONResponse do FastAPI (UTF-8, sem espaços)."""
+        body = json.dumps(
+            jsonable_encoder(value),
+            ensure_ascii=False,
+            allow_nan=False,
+            indent=None,
+            separators=(",", ":")
+        ).encode("utf-8")
+        return cls(body)
+
+    def decode(self) -> Any:
+        return json.loads(self.body)
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Verifica o cabeçalho If-None-Match (lista de ETags, fracos ou "*")."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [tag.strip() for tag in header.split(",")]
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+def json_response(
+    request: Request,
+    payload: CachedJSON,
+    max_age: int,
+    headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """Resposta 200 com os bytes do payload, ou 304 se o cliente já tem essa versão."""
+    response_headers = {"ETag": payload.etag, "Cache-Control": f"public, max-age={max_age}"}
+    response_headers.update(headers or {})
+    if etag_matches(request, payload.etag):
+        return Response(status_code=304, headers=response_headers)
+    return Response(content=payload.body, media_type="application/json", headers=response_headers)
@@ -0,0 +1,23 @@
+"""
+Cursores opacos para paginação por chave (keyset/seek).
+
+Em vez de OFFSET, a próxima página é "as linhas depois da última chave vista". O cursor é
+essa chave codificada em base64 (URL-safe), para o cliente apenas repassá-lo.
+"""
+from typing import Any
+import base64
+import json
+from fastapi import HTTPException
+
+def encode_cursor(value: Any) -> str:
+    """Cursor opaco para a última chave da página."""
+    raw = json.dumps({"k": value}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> Any:
+    """Chave contida no cursor. Cursor inválido: 400."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        return json.loads(raw)["k"]
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor de paginação inválido")
@@ -26,11 +26,13 @@ engine_local = create_engine(
     use_insertmanyvalues=False 
 )
 
-# Enable fast_executemany for pyodbc
+# Enable fast_executemany for pyodbc. Only pyodbc cursors have the attribute: on the SQLite
+# dev fallback, setting it raised AttributeError on every executemany (e.g. the batched
+# SYNC_CHUNK_FINGERPRINT inserts), so the hooks below check for it first.
 from sqlalchemy import event
 @event.listens_for(engine_local, "before_cursor_execute")
 def receive_before_cursor_execute(conn, cursor, statement, params, context, executemany):
-    if executemany:
+    if executemany and hasattr(cursor, "fast_executemany"):  # pyodbc only (not the SQLite fallback)
         cursor.fast_executemany = True
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine_local)
@@ -48,7 +50,7 @@ engine_validated = create_engine(
 # Enable fast_executemany for pyodbc
 @event.listens_for(engine_validated, "before_cursor_execute")
 def receive_before_cursor_execute_validated(conn, cursor, statement, params, context, executemany):
-    if executemany:
+    if executemany and hasattr(cursor, "fast_executemany"):  # pyodbc only (not the SQLite fallback)
         cursor.fast_executemany = True
 
 SessionValidated = sessionmaker(autocommit=False, autoflush=False, bind=engine_validated)
@@ -87,7 +89,7 @@ engine_audit = create_engine(
 # Enable fast_executemany for pyodbc
 @event.listens_for(engine_audit, "before_cursor_execute")
 def receive_before_cursor_execute_audit(conn, cursor, statement, params, context, executemany):
-    if executemany:
+    if executemany and hasattr(cursor, "fast_executemany"):  # pyodbc only (not the SQLite fallback)
         cursor.fast_executemany = True
 
 SessionAudit = sessionmaker(autocommit=False, autoflush=False, bind=engine_audit)
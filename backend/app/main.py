@@ -29,5 +29,19 @@ app.include_router(api_router, prefix=settings.API_V1_STR)
 @app.on_event("startup")
 async def startup_event():
     logger.info("Starting up Application...")
-    # Sync removed from startup to prevent bottlenecks.
-    # Use 'python backend/sync_tables.py' or external scheduler to sync data.
+    # Sync is not run at startup to prevent bottlenecks. With SYNC_SCHEDULER_ENABLED=true the
+    # built-in scheduler syncs each table per its freshness policy (SYNC_SCHEDULE); otherwise
+    # use 'python backend/sync_tables.py' or an external scheduler.
+    if settings.SYNC_SCHEDULER_ENABLED:
+        from app.services.sync_service import sync_service
+        from app.services.cache_refresh_service import CacheRefreshService
+        from app.services.sync_scheduler import sync_scheduler
+        # Syncs run in this process: drop the affected cache namespaces and re-warm them afterwards
+        sync_service.add_completion_listener(CacheRefreshService.on_sync_completed)
+        sync_scheduler.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if settings.SYNC_SCHEDULER_ENABLED:
+        from app.services.sync_scheduler import sync_scheduler
+        await sync_scheduler.stop()
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, String
+from app.models.base import Base
+
+class ProjectSearchToken(Base):
+    """Índice de busca de projetos: uma linha por palavra (normalizada, sem acento) de cada campo"""
+    __tablename__ = "PROJECT_SEARCH_TOKEN"
+
+    # Key order serves prefix lookups: WHERE field IN (...) AND token LIKE 'abc%'
+    field = Column(String(10), primary_key=True)  # desc / custo / coord / client / analyst
+    token = Column(String(50), primary_key=True)
+    CTT_CUSTO = Column(String(50), primary_key=True, index=True)
+
+class ProjectSearchDocument(Base):
+    """Hash dos campos indexados de cada projeto, para reindexar só o que mudou após o sync"""
+    __tablename__ = "PROJECT_SEARCH_DOCUMENT"
+
+    CTT_CUSTO = Column(String(50), primary_key=True)
+    text_hash = Column(String(32), nullable=False)
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, String, Float, Integer, Boolean, DateTime
+from app.models.base import Base
+
+class ProjectSummary(Base):
+    """Resumo materializado por projeto (custo sem espaços), mantido após o sync e na finalização"""
+    __tablename__ = "PROJECT_SUMMARY"
+
+    CTT_CUSTO = Column(String(50), primary_key=True)  # Trimmed
+    budget = Column(Float, default=0.0)  # CTT_SALINI
+    realized = Column(Float, default=0.0)  # SUM(E2_VALOR)
+    billed = Column(Float, default=0.0)  # SUM(C6_PRCVEN) com série e nota
+    pending = Column(Float, default=0.0)  # SUM(C6_PRCVEN) sem série ou nota (provisões)
+    usage_percent = Column(Float, default=0.0)
+    days_remaining = Column(Integer, nullable=True)  # CTT_DTFIM - computed_on
+    status = Column(String(30), nullable=True, index=True)
+    is_finalized = Column(Boolean, default=False, nullable=False)
+    computed_on = Column(String(8))  # YYYYMMDD the date-dependent fields refer to
+    updated_at = Column(DateTime)
@@ -6,6 +6,9 @@ class CTT010(Base):
     
     # Assuming CTT_CUSTO is unique/PK in the source context
     CTT_CUSTO = Column(String(50), primary_key=True, index=True)
+    # Record key in the ERP. CTT_CUSTO may repeat (e.g. one row per branch), so listings page
+    # by (CTT_CUSTO, R_E_C_N_O_)
+    R_E_C_N_O_ = Column(Integer)
     CTT_DESC01 = Column(String(200))
     CTT_DTINI = Column(String(8)) # Protheus dates are often strings YYYYMMDD
     CTT_DTFIM = Column(String(8))
@@ -0,0 +1,28 @@
+from sqlalchemy import Column, String, Float, DateTime, Integer, BigInteger
+from app.models.base import Base
+
+class SyncRunHistory(Base):
+    """Métricas de cada sincronização de tabela (uma linha por tabela por execução)"""
+    __tablename__ = "SYNC_RUN_HISTORY"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    run_id = Column(String(32), index=True)  # Same value for all tables of one sync_all call
+    table_name = Column(String(50), index=True)
+    mode = Column(String(20))  # full / incremental (as actually run)
+    status = Column(String(20))  # SUCCESS / ERROR
+    started_at = Column(DateTime, index=True)
+    finished_at = Column(DateTime)
+    duration_seconds = Column(Float)
+
+    rows_read = Column(BigInteger, default=0)
+    rows_written = Column(BigInteger, default=0)
+    bytes_read = Column(BigInteger, default=0)  # Estimated from sampled rows
+    fetch_seconds = Column(Float, default=0.0)
+    convert_seconds = Column(Float, default=0.0)
+    insert_seconds = Column(Float, default=0.0)
+    retries = Column(Integer, default=0)  # Insert batches that failed and were bisected
+    bad_rows = Column(Integer, default=0)  # Rows skipped after bisection
+    chunks_total = Column(Integer, default=0)
+    chunks_skipped = Column(Integer, default=0)  # Unchanged on the ERP (fingerprint match)
+    rows_per_second = Column(Float, default=0.0)  # rows_written / duration_seconds
+    error = Column(String(500), nullable=True)
@@ -0,0 +1,77 @@
+"""
+Invalidação e pré-aquecimento do cache após a sincronização.
+
+Quando uma tabela é sincronizada, só as entradas de cache marcadas com a tag dessa tabela
+(table_tag) são removidas. Em seguida, as chaves mais usadas (sem filtro de data e ano corrente)
+são recalculadas em segundo plano, para que o primeiro usuário já encontre o cache quente.
+"""
+import logging
+import threading
+from datetime import datetime
+from typing import List, Optional, Tuple
+from app.core.cache import cache, table_tag
+
+logger = logging.getLogger(__name__)
+
+# Tables read by the warmed-up summary and financial report
+WARM_UP_TABLES = {"CTT010", "SE2010", "SC6010"}
+
+
+class CacheRefreshService:
+    """Mantém o cache coerente com os dados recém-sincronizados."""
+
+    _warm_up_lock = threading.Lock()
+    _warm_up_requested = threading.Event()
+
+    @staticmethod
+    def warm_up_periods() -> List[Tuple[Optional[str], Optional[str]]]:
+        """Períodos pré-calculados: sem filtro de data e o ano corrente."""
+        year = datetime.now().year
+        return [(None, None), (f"{year}-01-01", f"{year}-12-31")]
+
+    @staticmethod
+    def invalidate_for_tables(tables: List[str]) -> int:
+        """Remove as entradas de cache que dependem das tabelas informadas."""
+        removed = cache.invalidate_tags(*(table_tag(table) for table in tables))
+        logger.info(f"Cache invalidated for {', '.join(tables)}: {removed} entries")
+        return removed
+
+    @staticmethod
+    def warm_up() -> None:
+        """Recalcula o resumo do dashboard e o relatório financeiro dos períodos mais acessados."""
+        CacheRefreshService._warm_up_requested.set()
+        if not CacheRefreshService._warm_up_lock.acquire(blocking=False):
+            return  # The running warm-up sees the request and does another pass
+        from app.db.session import SessionLocal
+        from app.services.dashboard_service import DashboardService
+        from app.services.report_service import ReportService
+
+        try:
+            while CacheRefreshService._warm_up_requested.is_set():
+                CacheRefreshService._warm_up_requested.clear()
+                started = datetime.now()
+                db = SessionLocal()
+                try:
+                    for start_date, end_date in CacheRefreshService.warm_up_periods():
+                        DashboardService.get_summary_json(db, start_date, end_date)
+                        ReportService.get_financial_report_json(db, start_date, end_date)
+                    logger.info(f"Cache warm-up finished in {(datetime.now() - started).total_seconds():.1f}s")
+                except Exception as e:
+                    logger.error(f"Cache warm-up failed: {e}")
+                finally:
+                    db.close()
+        finally:
+            CacheRefreshService._warm_up_lock.release()
+
+    @staticmethod
+    def on_sync_completed(tables: List[str], background: bool = True) -> None:
+        """Listener do sync_service: invalida as entradas afetadas e aquece o cache (em uma thread por padrão)."""
+        if not tables:
+            return
+        CacheRefreshService.invalidate_for_tables(tables)
+        if not WARM_UP_TABLES.intersection(tables):
+            return
+        if background:
+            threading.Thread(target=CacheRefreshService.warm_up, name="cache-warm-up", daemon=True).start()
+        else:
+            CacheRefreshService.warm_up()
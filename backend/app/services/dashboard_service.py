@@ -6,25 +6,16 @@ from sqlalchemy.orm import Session
 from app.services.kpi_service import KpiService
 from app.services.project_status_service import ProjectStatusService
 from app.services.chart_data_service import ChartDataService
-from app.core.cache import cache
-import hashlib
-import json
+from app.core.cache import cache, make_key, table_tag, custo_tag
+from app.core.http_cache import CachedJSON
+from app.db.session import SessionLocal
 
 class DashboardService:
     """Serviço principal do dashboard."""
     
     CACHE_TTL = 120  # 2 minutos
-    
-    @staticmethod
-    def _generate_cache_key(start_date: Optional[str], end_date: Optional[str]) -> str:
-        """Gera chave de cache única."""
-        key_data = {
-            "start_date": start_date or "",
-            "end_date": end_date or "",
-            "endpoint": "dashboard_summary"
-        }
-        key_string = json.dumps(key_data, sort_keys=True)
-        return f"dashboard_summary:{hashlib.md5(key_string.encode()).hexdigest()}"
+    STALE_TTL = 900  # Depois de CACHE_TTL serve o valor antigo (e recalcula em segundo plano) por até 15 minutos
+    CACHE_TAGS = [table_tag("CTT010"), table_tag("SE2010"), table_tag("SC6010"), table_tag("PROJECT_STATUS")]
     
     @staticmethod
     def get_summary(
@@ -36,12 +27,25 @@ class DashboardService:
         Obtém resumo completo do dashboard.
         Usa cache e orquestra outros serviços.
         """
-        cache_key = DashboardService._generate_cache_key(start_date, end_date)
-        cached = cache.get(cache_key)
-        if cached is not None:
-            return cached
+        return DashboardService.get_summary_json(db, start_date, end_date).decode()
+    
+    @staticmethod
+    def get_summary_json(
+        db: Session,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None
+    ) -> CachedJSON:
+        """
+        Resumo do dashboard já codificado em JSON, com ETag.
+        O cache guarda os bytes, então um acerto não paga validação nem codificação.
+        """
+        cache_key = make_key("dashboard_summary", start_date=start_date or "", end_date=end_date or "")
         
-        try:
+        def compute(db: Session = db):
+            with cache.bypass():
+                return build(db)
+        
+        def build(db: Session):
             # Get KPIs
             kpis = KpiService.calculate_all_kpis(db, start_date, end_date)
             
@@ -75,19 +79,33 @@ class DashboardService:
                 "projects_in_execution": projects_in_execution,
                 "projects_ending_soon": projects_ending_soon
             }
-            
-            # Cache result
-            cache.set(cache_key, result, ttl_seconds=DashboardService.CACHE_TTL)
-            return result
-            
+            return CachedJSON.encode(result)
+        
+        def refresh():
+            # Background recomputation runs after this request's session is closed
+            with SessionLocal() as session:
+                return compute(session)
+        
+        try:
+            # Concurrent misses wait for a single computation instead of each running the full fan-out;
+            # past CACHE_TTL the previous summary is returned at once while refresh() replaces it.
+            # The sections are computed without their own cache entries (cache.bypass), so the age
+            # of the summary is the age of this entry alone
+            return cache.get_or_compute(
+                cache_key, compute,
+                ttl_seconds=DashboardService.STALE_TTL,
+                soft_ttl_seconds=DashboardService.CACHE_TTL,
+                refresh=refresh,
+                tags=DashboardService.CACHE_TAGS
+            )
         except Exception as e:
             import traceback
             error_msg = f"Error generating dashboard summary: {e}"
             print(error_msg)
             traceback.print_exc()
             
-            # Return empty structure on error
-            return {
+            # Return empty structure on error (not cached)
+            return CachedJSON.encode({
                 "kpis": {
                     "total_projects": 0,
                     "total_budget": 0.0,
@@ -113,7 +131,7 @@ class DashboardService:
                 },
                 "projects_in_execution": [],
                 "projects_ending_soon": []
-            }
+            })
     
     @staticmethod
     def get_kpis_only(
@@ -167,5 +185,59 @@ class DashboardService:
     ) -> Dict[str, int]:
         """Obtém apenas estatísticas de status."""
         return ProjectStatusService.calculate_status_stats(db, start_date, end_date)
-
-
+    
+    @staticmethod
+    def _cached_json(namespace: str, compute, tags, **params) -> CachedJSON:
+        """
+        Seção do dashboard já codificada em JSON: um acerto devolve os bytes, sem nova codificação.
+        Só os bytes ficam em cache: a seção é calculada sem as entradas dos serviços (cache.bypass),
+        que somariam o TTL delas ao desta entrada.
+        """
+        def encode():
+            with cache.bypass():
+                return CachedJSON.encode(compute())
+        
+        return cache.get_or_compute(
+            make_key(namespace, **{name: value or "" for name, value in params.items()}),
+            encode,
+            ttl_seconds=DashboardService.CACHE_TTL,
+            tags=tags
+        )
+    
+    @staticmethod
+    def get_kpis_json(db: Session, start_date: Optional[str] = None, end_date: Optional[str] = None) -> CachedJSON:
+        return DashboardService._cached_json(
+            "dashboard_kpis_json", lambda: DashboardService.get_kpis_only(db, start_date, end_date),
+            DashboardService.CACHE_TAGS, start_date=start_date, end_date=end_date
+        )
+    
+    @staticmethod
+    def get_projects_json(
+        db: Session,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        limit: int = 10
+    ) -> CachedJSON:
+        # Like the project lists themselves, also invalidated when one of the listed custos changes
+        return DashboardService._cached_json(
+            "dashboard_projects_json", lambda: DashboardService.get_projects_only(db, start_date, end_date, limit),
+            lambda payload: [
+                *ProjectStatusService.LIST_TAGS,
+                *(custo_tag(p["id"]) for projects in payload.decode().values() for p in projects)
+            ],
+            start_date=start_date, end_date=end_date, limit=limit
+        )
+    
+    @staticmethod
+    def get_charts_json(db: Session, start_date: Optional[str] = None, end_date: Optional[str] = None) -> CachedJSON:
+        return DashboardService._cached_json(
+            "dashboard_charts_json", lambda: DashboardService.get_charts_only(db, start_date, end_date),
+            DashboardService.CACHE_TAGS, start_date=start_date, end_date=end_date
+        )
+    
+    @staticmethod
+    def get_status_stats_json(db: Session, start_date: Optional[str] = None, end_date: Optional[str] = None) -> CachedJSON:
+        return DashboardService._cached_json(
+            "dashboard_status_stats_json", lambda: DashboardService.get_status_stats_only(db, start_date, end_date),
+            [table_tag("CTT010"), table_tag("PROJECT_STATUS")], start_date=start_date, end_date=end_date
+        )
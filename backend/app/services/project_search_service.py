@@ -0,0 +1,192 @@
+"""
+Busca indexada de projetos.
+
+Os campos de texto de CTT010 (descrição, custo, coordenador, cliente, analista) são quebrados
+em palavras normalizadas (minúsculas, sem acento) na tabela PROJECT_SEARCH_TOKEN. A busca usa
+"token LIKE 'termo%'", que aproveita o índice, em vez de "ILIKE '%termo%'" sobre CTT010, que
+lê a tabela inteira a cada tecla. O índice é atualizado após cada sincronização de CTT010,
+reescrevendo só os projetos cujos campos mudaram, e para um projeto quando ele é criado ou
+editado pela API. Enquanto não existe, a busca usa ILIKE.
+"""
+import hashlib
+import json
+import logging
+import re
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import Session
+from app.db.session import engine_local, SessionLocal
+from app.models.protheus import CTT010
+from app.models.project_search import ProjectSearchToken, ProjectSearchDocument
+
+logger = logging.getLogger(__name__)
+
+# Indexed field -> CTT010 columns
+SEARCH_FIELDS: Dict[str, List[str]] = {
+    "desc": ["CTT_DESC01"],
+    "custo": ["CTT_CUSTO"],
+    "coord": ["CTT_NOMECO"],
+    "client": ["CTT_UNIDES"],
+    "analyst": ["CTT_ANADES", "CTT_ANALIS"],
+}
+
+TOKEN_MAX_LENGTH = 50
+CHUNK_SIZE = 500  # custos per DELETE ... IN (...) (SQL Server caps parameters at 2100)
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def normalize_text(value: Optional[str]) -> str:
+    """Minúsculas e sem acentos ("Conceição" -> "conceicao")."""
+    decomposed = unicodedata.normalize("NFKD", value or "")
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).lower()
+
+
+def tokenize(value: Optional[str]) -> List[str]:
+    """Palavras normalizadas de um texto."""
+    return [token[:TOKEN_MAX_LENGTH] for token in _TOKEN_PATTERN.findall(normalize_text(value))]
+
+
+class ProjectSearchService:
+    """Mantém e consulta o índice de busca de projetos."""
+
+    _ready = False
+
+    @staticmethod
+    def _field_tokens(field: str, values: Iterable[Optional[str]]) -> Set[str]:
+        tokens = {token for value in values for token in tokenize(value)}
+        if field == "custo":
+            # Codes are searched by any part ("0101" finds 001010167): index every suffix
+            tokens = {token[i:] for token in tokens for i in range(len(token))}
+        return tokens
+
+    @staticmethod
+    def is_ready() -> bool:
+        """O índice já foi construído (verificado uma vez por processo)."""
+        if ProjectSearchService._ready:
+            return True
+        try:
+            with engine_local.connect() as conn:
+                ProjectSearchService._ready = conn.execute(
+                    select(ProjectSearchDocument.CTT_CUSTO).limit(1)
+                ).first() is not None
+        except Exception:
+            return False  # Table not created yet
+        return ProjectSearchService._ready
+
+    @staticmethod
+    def filter_clause(fields: List[str], term: Optional[str], columns: List[Any]):
+        """
+        Critério para filtrar CTT010 pelo termo: cada palavra do termo deve ser o início de
+        uma palavra de algum dos campos (sem diferenciar acentos). Sem índice, usa ILIKE
+        '%termo%' nas colunas informadas.
+        """
+        if not term:
+            return None
+        words = tokenize(term)
+        if not words:
+            return None
+        if not ProjectSearchService.is_ready():
+            pattern = f"%{term}%"
+            return or_(*[column.ilike(pattern) for column in columns])
+        return and_(*[
+            CTT010.CTT_CUSTO.in_(
+                select(ProjectSearchToken.CTT_CUSTO).where(
+                    ProjectSearchToken.field.in_(fields),
+                    ProjectSearchToken.token.like(f"{word}%")
+                )
+            )
+            for word in words
+        ])
+
+    @staticmethod
+    def refresh(db: Session, custos: Optional[List[str]] = None) -> Tuple[int, int]:
+        """
+        Atualiza o índice a partir de CTT010 (inteiro, ou só os custos informados): reindexa
+        os projetos novos ou com campos alterados e remove os que saíram. Retorna
+        (reindexados, removidos).
+        """
+        ProjectSearchToken.__table__.create(bind=engine_local, checkfirst=True)
+        ProjectSearchDocument.__table__.create(bind=engine_local, checkfirst=True)
+        if custos is not None:
+            custos = [str(custo).strip() for custo in custos]
+
+        columns = sorted({column for field_columns in SEARCH_FIELDS.values() for column in field_columns})
+        rows_query = db.query(*[getattr(CTT010, column) for column in columns])
+        if custos is not None:
+            rows_query = rows_query.filter(CTT010.CTT_CUSTO.in_(custos))
+        rows = rows_query.all()
+
+        # Duplicated CTT_CUSTO rows are merged into one document
+        documents: Dict[str, List[Dict[str, Any]]] = {}
+        for row in rows:
+            values = dict(zip(columns, row))
+            if values["CTT_CUSTO"]:
+                documents.setdefault(values["CTT_CUSTO"], []).append(values)
+        hashes = {
+            custo: hashlib.md5(
+                json.dumps(sorted(json.dumps(version, sort_keys=True) for version in versions)).encode()
+            ).hexdigest()
+            for custo, versions in documents.items()
+        }
+
+        stored_query = db.query(ProjectSearchDocument.CTT_CUSTO, ProjectSearchDocument.text_hash)
+        if custos is not None:
+            stored_query = stored_query.filter(ProjectSearchDocument.CTT_CUSTO.in_(custos))
+        stored = dict(stored_query.all())
+        changed = [custo for custo, text_hash in hashes.items() if stored.get(custo) != text_hash]
+        removed = [custo for custo in stored if custo not in hashes]
+
+        stale = changed + removed
+        for i in range(0, len(stale), CHUNK_SIZE):
+            chunk = stale[i:i + CHUNK_SIZE]
+            db.query(ProjectSearchToken).filter(ProjectSearchToken.CTT_CUSTO.in_(chunk)).delete(synchronize_session=False)
+            db.query(ProjectSearchDocument).filter(ProjectSearchDocument.CTT_CUSTO.in_(chunk)).delete(synchronize_session=False)
+
+        tokens = []
+        for custo in changed:
+            for field, field_columns in SEARCH_FIELDS.items():
+                values = [version[column] for version in documents[custo] for column in field_columns]
+                tokens.extend(
+                    {"field": field, "token": token, "CTT_CUSTO": custo}
+                    for token in ProjectSearchService._field_tokens(field, values)
+                )
+        if tokens:
+            db.execute(ProjectSearchToken.__table__.insert(), tokens)
+        if changed:
+            db.execute(
+                ProjectSearchDocument.__table__.insert(),
+                [{"CTT_CUSTO": custo, "text_hash": hashes[custo]} for custo in changed]
+            )
+        db.commit()
+        if custos is None:
+            ProjectSearchService._ready = bool(hashes)
+        return len(changed), len(removed)
+
+    @staticmethod
+    def refresh_projects(custos: List[str]) -> None:
+        """Reindexa os custos informados após uma alteração local (criação ou edição de CTT010)."""
+        if not ProjectSearchService.is_ready():
+            return  # No index yet: search still uses ILIKE on CTT010
+        with SessionLocal() as db:
+            try:
+                ProjectSearchService.refresh(db, custos)
+            except Exception as e:
+                db.rollback()
+                print(f"Aviso: Erro ao atualizar o índice de busca: {str(e)}")
+
+    @staticmethod
+    def on_sync_completed(tables: List[str]) -> None:
+        """Listener do sync_service: reindexa após a sincronização de CTT010."""
+        if "CTT010" not in tables:
+            return
+        db = SessionLocal()
+        try:
+            changed, removed = ProjectSearchService.refresh(db)
+            logger.info(f"Project search index refreshed: {changed} projects reindexed, {removed} removed")
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Project search index refresh failed: {e}")
+        finally:
+            db.close()
@@ -3,192 +3,164 @@ Serviço para cálculo de status de projetos.
 """
 from typing import Dict, Any, Optional, List
 from sqlalchemy.orm import Session
-from sqlalchemy import func, or_
+from sqlalchemy import func, or_, and_, not_, case, false
 from datetime import datetime, timedelta
-from app.models.protheus import CTT010, SE2010
+from app.models.protheus import CTT010
 from app.models.project_status import ProjectStatus
-from app.core.cache import cache
-import hashlib
-import json
+from app.core.cache import cache, make_key, table_tag, custo_tag
+from app.services.project_summary_service import ProjectSummaryService
 
 class ProjectStatusService:
     """Serviço para cálculo de status de projetos."""
     
     CACHE_TTL = 120  # 2 minutos
-    
-    @staticmethod
-    def _generate_cache_key(prefix: str, start_date: Optional[str], end_date: Optional[str]) -> str:
-        """Gera chave de cache única."""
-        key_data = {
-            "prefix": prefix,
-            "start_date": start_date or "",
-            "end_date": end_date or "",
-        }
-        key_string = json.dumps(key_data, sort_keys=True)
-        return f"{prefix}:{hashlib.md5(key_string.encode()).hexdigest()}"
+    # Listas de projetos: também são invalidadas quando um dos custos listados muda
+    LIST_TAGS = [table_tag("CTT010"), table_tag("SE2010"), table_tag("PROJECT_STATUS")]
     
     @staticmethod
     def _get_finalized_custos(db: Session) -> set:
         """Obtém conjunto de custos finalizados com cache."""
-        cache_key = "finalized_custos_set"
-        cached = cache.get(cache_key)
-        if cached is not None:
-            return cached
+        cache_key = make_key("finalized_custos_set")
         
-        try:
+        def compute():
             finalized_statuses = db.query(ProjectStatus.CTT_CUSTO).filter(
                 ProjectStatus.is_finalized == True
             ).all()
-            result = {str(status.CTT_CUSTO).strip() for status in finalized_statuses if status.CTT_CUSTO}
+            return {str(status.CTT_CUSTO).strip() for status in finalized_statuses if status.CTT_CUSTO}
+        
+        try:
             # Cache por 5 minutos (mais longo que stats porque muda menos frequentemente)
-            cache.set(cache_key, result, ttl_seconds=300)
-            return result
+            return cache.get_or_compute(cache_key, compute, ttl_seconds=300, tags=[table_tag("PROJECT_STATUS")])
         except Exception as e:
             print(f"Aviso: Erro ao consultar projetos finalizados: {str(e)}")
             return set()
     
     @staticmethod
-    def calculate_status_stats(
-        db: Session, 
-        start_date: Optional[str], 
-        end_date: Optional[str]
-    ) -> Dict[str, int]:
+    def count_status_buckets(db: Session, filters: List[Any]) -> Dict[str, int]:
         """
-        Calcula estatísticas de status de projetos usando SQL agregado.
-        Muito mais rápido que buscar todos os projetos e processar em Python.
+        Conta os projetos de CTT010 (com os filtros informados) em todos os status de uma vez.
+        Com o resumo construído, é um GROUP BY no status pré-calculado de PROJECT_SUMMARY;
+        antes disso, uma única consulta com SUM(CASE ...) e LEFT JOIN em PROJECT_STATUS.
+        Prioridades: 1. Finalizado, 2. Em Execução (vigência), 3. Encerrado (ERP), 4. Prestar Contas.
         """
-        cache_key = ProjectStatusService._generate_cache_key("status_stats", start_date, end_date)
-        cached = cache.get(cache_key)
-        if cached is not None:
-            return cached
+        try:
+            counts = ProjectSummaryService.count_statuses(db, filters)
+            if counts is not None:
+                return counts
+        except Exception as e:
+            print(f"Aviso: Erro ao contar status em PROJECT_SUMMARY: {str(e)}")
+            db.rollback()
         
         today_dt = datetime.now()
         today_str = today_dt.strftime("%Y%m%d")
         sixty_days_ago_str = (today_dt - timedelta(days=60)).strftime("%Y%m%d")
         thirty_days_later_str = (today_dt + timedelta(days=30)).strftime("%Y%m%d")
         
-        # Get finalized custos once (cached)
-        finalized_custos = ProjectStatusService._get_finalized_custos(db)
-        
-        # Build base query with filters
-        from sqlalchemy import func, case, and_, or_, text
-        from sqlalchemy.sql import literal
-        
-        base_query = db.query(CTT010)
-        
-        # Apply date filters
-        if start_date:
-            d_start = start_date.replace("-", "")
-            base_query = base_query.filter(CTT010.CTT_DTINI >= d_start)
-        if end_date:
-            d_end = end_date.replace("-", "")
-            base_query = base_query.filter(CTT010.CTT_DTINI <= d_end)
-        
-        # Filter valid dates only (8 characters)
-        base_query = base_query.filter(
-            func.len(CTT010.CTT_DTINI) == 8,
-            func.len(CTT010.CTT_DTFIM) == 8
-        )
-        
-        # Use SQL CASE WHEN for efficient aggregation
-        # This calculates all stats in a single query instead of fetching all rows
-        
-        # For finalized projects exclusion, we need to check if CTT_CUSTO is in finalized_custos
-        # Since we can't easily do this in pure SQL without a subquery, we'll use a hybrid approach:
-        # 1. Calculate stats for all projects
-        # 2. Subtract finalized projects from rendering_accounts
-        
-        # Calculate in_execution (projects where start <= today <= end AND NOT finalized)
-        # Priorities: 1. Finalized, 2. In Execution (Vigência), 3. Closed (ERP), 4. Rendering Accounts
-        in_execution_query = base_query.filter(
-            CTT010.CTT_DTINI <= today_str,
-            CTT010.CTT_DTFIM >= today_str
-        )
-        if finalized_custos:
-             in_execution_query = in_execution_query.filter(~CTT010.CTT_CUSTO.in_(list(finalized_custos)))
-        in_execution_count = in_execution_query.count()
-        
-        # Calculate ending_soon (subset of in_execution)
-        ending_soon_query = in_execution_query.filter(
-            CTT010.CTT_DTFIM <= thirty_days_later_str
-        )
-        ending_soon_count = ending_soon_query.count()
-        
-        # Calculate not_started (start > today AND NOT finalized)
-        not_started_query = base_query.filter(
-            CTT010.CTT_DTINI > today_str
-        )
-        if finalized_custos:
-            not_started_query = not_started_query.filter(~CTT010.CTT_CUSTO.in_(list(finalized_custos)))
-        not_started_count = not_started_query.count()
-        
-        # Calculate rendering_accounts (end < today AND not finalized AND not closed AND not in execution)
-        # Exclude in_execution (already implicitly excluded by DTFIM < today)
-        # Exclude finalized
-        rendering_query = base_query.filter(
-            CTT010.CTT_DTFIM < today_str,
-            or_(
-                CTT010.CTT_DTENC.is_(None),
-                CTT010.CTT_DTENC == '',
-                func.len(CTT010.CTT_DTENC) != 8,
-                CTT010.CTT_DTENC > today_str
+        def run(with_project_status: bool):
+            if with_project_status:
+                finalized = ProjectStatus.CTT_CUSTO.isnot(None)
+            else:
+                finalized = false()
+            not_finalized = not_(finalized)
+            in_execution = and_(
+                CTT010.CTT_DTINI <= today_str,
+                CTT010.CTT_DTFIM >= today_str,
+                not_finalized
             )
-        )
-        
-        # Get all rendering projects to filter out finalized ones
-        rendering_projects = rendering_query.with_entities(CTT010.CTT_CUSTO).all()
-        rendering_custos = {str(p.CTT_CUSTO).strip() for p in rendering_projects if p.CTT_CUSTO}
-        
-        # Filter out finalized projects
-        non_finalized_rendering = rendering_custos - finalized_custos
-        rendering_accounts_count = len(non_finalized_rendering)
-        
-        # Calculate rendering_accounts_60days (ended in last 60 days AND not finalized AND not closed - CTT_DTENC > hoje ou vazio)
-        rendering_60days_query = base_query.filter(
-            CTT010.CTT_DTFIM < today_str,
-            CTT010.CTT_DTFIM >= sixty_days_ago_str,
-            or_(
+            # Not closed in the ERP (CTT_DTENC empty, invalid or in the future)
+            not_closed = or_(
                 CTT010.CTT_DTENC.is_(None),
                 CTT010.CTT_DTENC == '',
                 func.len(CTT010.CTT_DTENC) != 8,
                 CTT010.CTT_DTENC > today_str
             )
-        )
-        rendering_60days_projects = rendering_60days_query.with_entities(CTT010.CTT_CUSTO).all()
-        rendering_60days_custos = {str(p.CTT_CUSTO).strip() for p in rendering_60days_projects if p.CTT_CUSTO}
-        non_finalized_rendering_60days = rendering_60days_custos - finalized_custos
-        rendering_accounts_60days_count = len(non_finalized_rendering_60days)
+            buckets = {
+                "in_execution": in_execution,
+                "ending_soon": and_(in_execution, CTT010.CTT_DTFIM <= thirty_days_later_str),
+                # Same priority as project_status(): closed in the ERP or already ended (inverted
+                # dates) take precedence over not started
+                "not_started": and_(
+                    CTT010.CTT_DTINI > today_str,
+                    CTT010.CTT_DTFIM >= today_str,
+                    not_closed,
+                    not_finalized
+                ),
+                "rendering_accounts": and_(CTT010.CTT_DTFIM < today_str, not_closed, not_finalized),
+                "rendering_accounts_60days": and_(
+                    CTT010.CTT_DTFIM < today_str,
+                    CTT010.CTT_DTFIM >= sixty_days_ago_str,
+                    not_closed,
+                    not_finalized
+                ),
+                "finalized": finalized,
+                # Closed in the ERP and outside the validity period (in execution takes priority)
+                "closed": and_(
+                    CTT010.CTT_DTENC.isnot(None),
+                    CTT010.CTT_DTENC != '',
+                    func.len(CTT010.CTT_DTENC) == 8,
+                    CTT010.CTT_DTENC <= today_str,
+                    or_(
+                        func.trim(CTT010.CTT_DTINI) > today_str,
+                        func.trim(CTT010.CTT_DTFIM) < today_str
+                    ),
+                    not_finalized
+                )
+            }
+            query = db.query(
+                func.count(CTT010.CTT_CUSTO).label("total"),
+                *[func.sum(case((condition, 1), else_=0)).label(name) for name, condition in buckets.items()]
+            ).select_from(CTT010)
+            if with_project_status:
+                query = query.outerjoin(
+                    ProjectStatus,
+                    and_(
+                        # PROJECT_STATUS is small and may hold padded legacy keys
+                        func.trim(ProjectStatus.CTT_CUSTO) == CTT010.CTT_CUSTO,
+                        ProjectStatus.is_finalized == True
+                    )
+                )
+            row = query.filter(*filters).one()
+            return {name: int(row._mapping[name] or 0) for name in ["total", *buckets]}
         
-        # Finalized count (extra info for consistency)
-        finalized_count = len(finalized_custos) if finalized_custos else 0
+        try:
+            return run(with_project_status=True)
+        except Exception as e:
+            # Se a tabela PROJECT_STATUS não existir, conta sem projetos finalizados
+            print(f"Aviso: Erro ao consultar projetos finalizados: {str(e)}")
+            db.rollback()
+            return run(with_project_status=False)
+    
+    @staticmethod
+    def calculate_status_stats(
+        db: Session, 
+        start_date: Optional[str], 
+        end_date: Optional[str]
+    ) -> Dict[str, int]:
+        """
+        Calcula estatísticas de status de projetos usando SQL agregado.
+        Muito mais rápido que buscar todos os projetos e processar em Python.
+        """
+        cache_key = make_key("status_stats", start_date=start_date or "", end_date=end_date or "")
+        
+        def compute():
+            filters = [
+                # Filter valid dates only (8 characters)
+                func.len(CTT010.CTT_DTINI) == 8,
+                func.len(CTT010.CTT_DTFIM) == 8
+            ]
+            if start_date:
+                filters.append(CTT010.CTT_DTINI >= start_date.replace("-", ""))
+            if end_date:
+                filters.append(CTT010.CTT_DTINI <= end_date.replace("-", ""))
+            
+            status_stats = ProjectStatusService.count_status_buckets(db, filters)
+            del status_stats["total"]
+            return status_stats
         
-        # Closed count (projetos com CTT_DTENC preenchido E data <= hoje) - EXCLUINDO finalizados e In Execution
-        closed_query = base_query.filter(
-            CTT010.CTT_DTENC.isnot(None),
-            CTT010.CTT_DTENC != '',
-            func.len(CTT010.CTT_DTENC) == 8,
-            CTT010.CTT_DTENC <= today_str,
-            or_(
-                func.trim(CTT010.CTT_DTINI) > today_str,
-                func.trim(CTT010.CTT_DTFIM) < today_str
-            )
+        return cache.get_or_compute(
+            cache_key, compute, ttl_seconds=ProjectStatusService.CACHE_TTL,
+            tags=[table_tag("CTT010"), table_tag("PROJECT_STATUS")]
         )
-        if finalized_custos:
-            closed_query = closed_query.filter(~CTT010.CTT_CUSTO.in_(list(finalized_custos)))
-        closed_count = closed_query.count()
-
-        status_stats = {
-            "in_execution": in_execution_count,
-            "ending_soon": ending_soon_count,
-            "rendering_accounts": rendering_accounts_count,
-            "rendering_accounts_60days": rendering_accounts_60days_count,
-            "not_started": not_started_count,
-            "finalized": finalized_count,
-            "closed": closed_count
-        }
-        
-        cache.set(cache_key, status_stats, ttl_seconds=ProjectStatusService.CACHE_TTL)
-        return status_stats
     
     @staticmethod
     def get_projects_in_execution(
@@ -198,97 +170,77 @@ class ProjectStatusService:
         limit: int = 10
     ) -> List[Dict[str, Any]]:
         """Obtém lista de projetos em execução."""
-        cache_key = ProjectStatusService._generate_cache_key(
-            f"projects_in_execution_{limit}", start_date, end_date
-        )
-        cached = cache.get(cache_key)
-        if cached is not None:
-            return cached
+        cache_key = make_key("projects_in_execution", limit=limit, start_date=start_date or "", end_date=end_date or "")
         
-        today_dt = datetime.now()
-        today_str = today_dt.strftime("%Y%m%d")
+        def compute():
+            today_dt = datetime.now()
+            today_str = today_dt.strftime("%Y%m%d")
         
-        filters = []
-        if start_date:
-            d_start = start_date.replace("-", "")
-            filters.append(CTT010.CTT_DTINI >= d_start)
-        if end_date:
-            d_end = end_date.replace("-", "")
-            filters.append(CTT010.CTT_DTINI <= d_end)
+            filters = []
+            if start_date:
+                d_start = start_date.replace("-", "")
+                filters.append(CTT010.CTT_DTINI >= d_start)
+            if end_date:
+                d_end = end_date.replace("-", "")
+                filters.append(CTT010.CTT_DTINI <= d_end)
         
-        finalized_custos = ProjectStatusService._get_finalized_custos(db)
+            finalized_custos = ProjectStatusService._get_finalized_custos(db)
         
-        query = db.query(CTT010).filter(
-            CTT010.CTT_DTINI <= today_str,
-            CTT010.CTT_DTFIM >= today_str
-        )
-        # Priority: Vigência takes precedence over ERP Closed.
-        # Still excludes internally finalized as those are explicitly marked as completed.
-        if finalized_custos:
-            query = query.filter(~CTT010.CTT_CUSTO.in_(list(finalized_custos)))
+            query = db.query(CTT010).filter(
+                CTT010.CTT_DTINI <= today_str,
+                CTT010.CTT_DTFIM >= today_str
+            )
+            # Priority: Vigência takes precedence over ERP Closed.
+            # Still excludes internally finalized as those are explicitly marked as completed.
+            if finalized_custos:
+                query = query.filter(~CTT010.CTT_CUSTO.in_(list(finalized_custos)))
             
-        if filters:
-            query = query.filter(*filters)
-        
-        in_execution_projects = query.limit(limit).all()
-        
-        # Get realized values in batch
-        in_execution_custos = [
-            str(p.CTT_CUSTO).strip() if p.CTT_CUSTO else "" 
-            for p in in_execution_projects
-        ]
-        in_execution_custos = [c for c in in_execution_custos if c]
-        
-        realized_dict = {}
-        if in_execution_custos:
-            try:
-                from sqlalchemy import func
-                realized_results = db.query(
-                    SE2010.E2_CUSTO,
-                    func.sum(SE2010.E2_VALOR).label('realized')
-                ).filter(
-                    SE2010.E2_CUSTO.in_(in_execution_custos),
-                    SE2010.D_E_L_E_T_ != '*'
-                ).group_by(SE2010.E2_CUSTO).all()
-                
-                for row in realized_results:
-                    try:
-                        custo = row.E2_CUSTO.strip() if hasattr(row, 'E2_CUSTO') else str(row[0]).strip()
-                        realized = float(row.realized or 0.0) if hasattr(row, 'realized') else float(row[1] or 0.0)
-                        realized_dict[custo] = realized
-                    except:
-                        continue
-            except Exception as e:
-                print(f"Warning: SE2010 table not available: {e}")
-        
-        result = []
-        for p in in_execution_projects:
-            try:
-                fim_date = datetime.strptime(p.CTT_DTFIM or "", "%Y%m%d")
-                days_remaining = (fim_date - today_dt).days
-            except:
-                days_remaining = None
+            if filters:
+                query = query.filter(*filters)
+        
+            in_execution_projects = query.limit(limit).all()
+        
+            # Get realized values in batch
+            in_execution_custos = [
+                str(p.CTT_CUSTO).strip() if p.CTT_CUSTO else "" 
+                for p in in_execution_projects
+            ]
+            in_execution_custos = [c for c in in_execution_custos if c]
+        
+            # Realized per custo, read by key from PROJECT_SUMMARY
+            realized_dict = ProjectSummaryService.get_realized(db, in_execution_custos)
+        
+            result = []
+            for p in in_execution_projects:
+                try:
+                    fim_date = datetime.strptime(p.CTT_DTFIM or "", "%Y%m%d")
+                    days_remaining = (fim_date - today_dt).days
+                except:
+                    days_remaining = None
             
-            custo_stripped = str(p.CTT_CUSTO).strip() if p.CTT_CUSTO else ""
-            budget = float(p.CTT_SALINI or 0.0)
-            realized = realized_dict.get(custo_stripped, 0.0)
-            usage_percent = (realized / budget * 100) if budget > 0 else 0.0
+                custo_stripped = str(p.CTT_CUSTO).strip() if p.CTT_CUSTO else ""
+                budget = float(p.CTT_SALINI or 0.0)
+                realized = realized_dict.get(custo_stripped, 0.0)
+                usage_percent = (realized / budget * 100) if budget > 0 else 0.0
             
-            result.append({
-                "id": custo_stripped,
-                "name": (p.CTT_DESC01 or "Sem Nome").strip(),
-                "daysRemaining": days_remaining,
-                "budget": float(budget),
-                "realized": float(realized),
-                "usage_percent": float(usage_percent),
-                "status": "in_execution"
-            })
-        
-        # Sort by days remaining
-        result.sort(key=lambda x: x["daysRemaining"] if x["daysRemaining"] is not None else 9999)
+                result.append({
+                    "id": custo_stripped,
+                    "name": (p.CTT_DESC01 or "Sem Nome").strip(),
+                    "daysRemaining": days_remaining,
+                    "budget": float(budget),
+                    "realized": float(realized),
+                    "usage_percent": float(usage_percent),
+                    "status": "in_execution"
+                })
+        
+            # Sort by days remaining
+            result.sort(key=lambda x: x["daysRemaining"] if x["daysRemaining"] is not None else 9999)
+            return result
         
-        cache.set(cache_key, result, ttl_seconds=ProjectStatusService.CACHE_TTL)
-        return result
+        return cache.get_or_compute(
+            cache_key, compute, ttl_seconds=ProjectStatusService.CACHE_TTL,
+            tags=lambda projects: [*ProjectStatusService.LIST_TAGS, *(custo_tag(p["id"]) for p in projects)]
+        )
     
     @staticmethod
     def get_projects_ending_soon(
@@ -298,95 +250,75 @@ class ProjectStatusService:
         limit: int = 10
     ) -> List[Dict[str, Any]]:
         """Obtém lista de projetos finalizando em breve."""
-        cache_key = ProjectStatusService._generate_cache_key(
-            f"projects_ending_soon_{limit}", start_date, end_date
-        )
-        cached = cache.get(cache_key)
-        if cached is not None:
-            return cached
-        
-        today_dt = datetime.now()
-        today_str = today_dt.strftime("%Y%m%d")
-        thirty_days_later = (today_dt + timedelta(days=30)).strftime("%Y%m%d")
-        
-        filters = []
-        if start_date:
-            d_start = start_date.replace("-", "")
-            filters.append(CTT010.CTT_DTINI >= d_start)
-        if end_date:
-            d_end = end_date.replace("-", "")
-            filters.append(CTT010.CTT_DTINI <= d_end)
-        
-        query = db.query(CTT010).filter(
-            CTT010.CTT_DTINI <= today_str,
-            CTT010.CTT_DTFIM >= today_str,
-            CTT010.CTT_DTFIM <= thirty_days_later
-        )
-        if filters:
-            query = query.filter(*filters)
-        
-        ending_soon_projects = query.all()
-        ending_soon_filtered = []
-        
-        for p in ending_soon_projects:
-            try:
-                fim_date = datetime.strptime(p.CTT_DTFIM or "", "%Y%m%d")
-                days_remaining = (fim_date - today_dt).days
-                if 0 <= days_remaining <= 30:
-                    ending_soon_filtered.append((p, days_remaining))
-            except:
-                continue
-        
-        # Sort and limit
-        ending_soon_filtered.sort(key=lambda x: x[1])
-        ending_soon_filtered = ending_soon_filtered[:limit]
-        
-        # Get realized values in batch
-        ending_soon_custos = [
-            str(p.CTT_CUSTO).strip() if p.CTT_CUSTO else "" 
-            for p, _ in ending_soon_filtered
-        ]
-        ending_soon_custos = [c for c in ending_soon_custos if c]
-        
-        realized_dict = {}
-        if ending_soon_custos:
-            try:
-                from sqlalchemy import func
-                realized_results = db.query(
-                    SE2010.E2_CUSTO,
-                    func.sum(SE2010.E2_VALOR).label('realized')
-                ).filter(
-                    SE2010.E2_CUSTO.in_(ending_soon_custos),
-                    SE2010.D_E_L_E_T_ != '*'
-                ).group_by(SE2010.E2_CUSTO).all()
-                
-                for row in realized_results:
-                    try:
-                        custo = row.E2_CUSTO.strip() if hasattr(row, 'E2_CUSTO') else str(row[0]).strip()
-                        realized = float(row.realized or 0.0) if hasattr(row, 'realized') else float(row[1] or 0.0)
-                        realized_dict[custo] = realized
-                    except:
-                        continue
-            except Exception as e:
-                print(f"Warning: SE2010 table not available: {e}")
-        
-        result = []
-        for p, days_remaining in ending_soon_filtered:
-            custo_stripped = str(p.CTT_CUSTO).strip() if p.CTT_CUSTO else ""
-            budget = float(p.CTT_SALINI or 0.0)
-            realized = realized_dict.get(custo_stripped, 0.0)
-            usage_percent = (realized / budget * 100) if budget > 0 else 0.0
+        cache_key = make_key("projects_ending_soon", limit=limit, start_date=start_date or "", end_date=end_date or "")
+        
+        def compute():
+            today_dt = datetime.now()
+            today_str = today_dt.strftime("%Y%m%d")
+            thirty_days_later = (today_dt + timedelta(days=30)).strftime("%Y%m%d")
+        
+            filters = []
+            if start_date:
+                d_start = start_date.replace("-", "")
+                filters.append(CTT010.CTT_DTINI >= d_start)
+            if end_date:
+                d_end = end_date.replace("-", "")
+                filters.append(CTT010.CTT_DTINI <= d_end)
+        
+            query = db.query(CTT010).filter(
+                CTT010.CTT_DTINI <= today_str,
+                CTT010.CTT_DTFIM >= today_str,
+                CTT010.CTT_DTFIM <= thirty_days_later
+            )
+            if filters:
+                query = query.filter(*filters)
+        
+            ending_soon_projects = query.all()
+            ending_soon_filtered = []
+        
+            for p in ending_soon_projects:
+                try:
+                    fim_date = datetime.strptime(p.CTT_DTFIM or "", "%Y%m%d")
+                    days_remaining = (fim_date - today_dt).days
+                    if 0 <= days_remaining <= 30:
+                        ending_soon_filtered.append((p, days_remaining))
+                except:
+                    continue
+        
+            # Sort and limit
+            ending_soon_filtered.sort(key=lambda x: x[1])
+            ending_soon_filtered = ending_soon_filtered[:limit]
+        
+            # Get realized values in batch
+            ending_soon_custos = [
+                str(p.CTT_CUSTO).strip() if p.CTT_CUSTO else "" 
+                for p, _ in ending_soon_filtered
+            ]
+            ending_soon_custos = [c for c in ending_soon_custos if c]
+        
+            # Realized per custo, read by key from PROJECT_SUMMARY
+            realized_dict = ProjectSummaryService.get_realized(db, ending_soon_custos)
+        
+            result = []
+            for p, days_remaining in ending_soon_filtered:
+                custo_stripped = str(p.CTT_CUSTO).strip() if p.CTT_CUSTO else ""
+                budget = float(p.CTT_SALINI or 0.0)
+                realized = realized_dict.get(custo_stripped, 0.0)
+                usage_percent = (realized / budget * 100) if budget > 0 else 0.0
             
-            result.append({
-                "id": custo_stripped,
-                "name": (p.CTT_DESC01 or "Sem Nome").strip(),
-                "daysRemaining": days_remaining,
-                "budget": float(budget),
-                "realized": float(realized),
-                "usage_percent": float(usage_percent),
-                "status": "ending_soon"
-            })
+                result.append({
+                    "id": custo_stripped,
+                    "name": (p.CTT_DESC01 or "Sem Nome").strip(),
+                    "daysRemaining": days_remaining,
+                    "budget": float(budget),
+                    "realized": float(realized),
+                    "usage_percent": float(usage_percent),
+                    "status": "ending_soon"
+                })
+            return result
         
-        cache.set(cache_key, result, ttl_seconds=ProjectStatusService.CACHE_TTL)
-        return result
+        return cache.get_or_compute(
+            cache_key, compute, ttl_seconds=ProjectStatusService.CACHE_TTL,
+            tags=lambda projects: [*ProjectStatusService.LIST_TAGS, *(custo_tag(p["id"]) for p in projects)]
+        )
 
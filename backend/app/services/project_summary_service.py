@@ -0,0 +1,403 @@
+"""
+Resumo materializado dos projetos (tabela PROJECT_SUMMARY).
+
+Uma linha por custo (sem espaços) com orçamento, realizado, faturado, pendente, % de uso,
+dias restantes, status e finalização. Os valores são agregados de uma vez (GROUP BY em
+SE2010 e SC6010) após cada sincronização e recalculados para um projeto quando a sua
+finalização muda; só as linhas que mudaram são regravadas. As telas leem o realizado por
+chave em vez de somar SE2010 a cada requisição.
+
+O status (um por projeto) e os dias restantes valem para o dia em que foram calculados
+(computed_on): na primeira leitura de um novo dia são recalculados a partir de CTT010 e
+PROJECT_STATUS. O filtro de status e os contadores viram igualdade/GROUP BY na coluna indexada.
+"""
+import logging
+import threading
+from datetime import datetime, date
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import func, case, and_, false, select, update
+from sqlalchemy.orm import Session
+from app.db.session import engine_local, SessionLocal
+from app.models.protheus import CTT010, SE2010, SC6010
+from app.models.project_status import ProjectStatus
+from app.models.project_summary import ProjectSummary
+
+logger = logging.getLogger(__name__)
+
+# Tables whose sync changes the summary
+SUMMARY_SOURCE_TABLES = {"CTT010", "SE2010", "SC6010"}
+
+SUMMARY_FIELDS = [
+    "budget", "realized", "billed", "pending", "usage_percent",
+    "days_remaining", "status", "is_finalized", "computed_on"
+]
+# Fields that depend only on CTT010, PROJECT_STATUS and the current date
+STATUS_FIELDS = ["days_remaining", "status", "is_finalized", "computed_on"]
+
+STATUSES = ["in_execution", "not_started", "rendering_accounts", "finalized", "closed"]
+# Sub-buckets: status + days_remaining range
+ENDING_SOON_DAYS = 30              # in_execution ending within 30 days
+RENDERING_ACCOUNTS_RECENT_DAYS = 60  # rendering_accounts ended at most 60 days ago
+
+CHUNK_SIZE = 500  # custos per IN (...) (SQL Server caps parameters at 2100)
+
+
+def project_status(
+    dtini: Optional[str],
+    dtfim: Optional[str],
+    dtenc: Optional[str],
+    is_finalized: bool,
+    today: str
+) -> Optional[str]:
+    """
+    Status de um projeto: exatamente um por projeto, None se as datas forem inválidas.
+    Prioridades: 1. Finalizado, 2. Em Execução (vigência), 3. Encerrado (ERP), 4. Prestar Contas,
+    5. Não Iniciado.
+    """
+    dtini, dtfim, dtenc = (dtini or "").strip(), (dtfim or "").strip(), (dtenc or "").strip()
+    if is_finalized:
+        return "finalized"
+    if len(dtini) != 8 or len(dtfim) != 8:
+        return None
+    if dtini <= today <= dtfim:
+        return "in_execution"
+    if len(dtenc) == 8 and dtenc <= today:
+        return "closed"
+    if dtfim < today:
+        return "rendering_accounts"
+    if dtini > today:
+        return "not_started"
+    return None
+
+
+def status_fields(
+    dtini: Optional[str],
+    dtfim: Optional[str],
+    dtenc: Optional[str],
+    is_finalized: bool,
+    today: date
+) -> Dict[str, Any]:
+    """Campos de STATUS_FIELDS de um projeto no dia informado."""
+    today_str = today.strftime("%Y%m%d")
+    try:
+        days_remaining = (datetime.strptime((dtfim or "").strip(), "%Y%m%d").date() - today).days
+    except ValueError:
+        days_remaining = None
+    return {
+        "days_remaining": days_remaining,
+        "status": project_status(dtini, dtfim, dtenc, is_finalized, today_str),
+        "is_finalized": is_finalized,
+        "computed_on": today_str
+    }
+
+
+class ProjectSummaryService:
+    """Mantém e consulta PROJECT_SUMMARY."""
+
+    _ready = False
+    _current_on: Optional[str] = None  # Day the statuses were last checked in this process
+    _status_lock = threading.Lock()
+
+    @staticmethod
+    def is_ready() -> bool:
+        """O resumo já foi construído (verificado uma vez por processo)."""
+        if ProjectSummaryService._ready:
+            return True
+        try:
+            with engine_local.connect() as conn:
+                ProjectSummaryService._ready = conn.execute(
+                    select(ProjectSummary.CTT_CUSTO).limit(1)
+                ).first() is not None
+        except Exception:
+            return False  # Table not created yet
+        return ProjectSummaryService._ready
+
+    @staticmethod
+    def _sums_by_custo(db: Session, key_column, value_columns: List[Any], filters: List[Any]) -> Dict[str, Tuple]:
+        """{custo: (somas...)} de uma tabela de movimentos; vazio se ela não existir."""
+        try:
+            rows = db.query(key_column, *value_columns).filter(*filters).group_by(key_column).all()
+        except Exception as e:
+            print(f"Warning: {key_column.table.name} table not available: {e}")
+            db.rollback()
+            return {}
+        return {row[0]: tuple(float(value or 0.0) for value in row[1:]) for row in rows if row[0]}
+
+    @staticmethod
+    def _finalized_custos(db: Session, custos: Optional[List[str]] = None) -> set:
+        """
+        Custos finalizados em PROJECT_STATUS (sem espaços); vazio se a tabela não existir.
+        Linhas antigas podem ter o custo com espaços: a tabela é pequena, então o TRIM é barato.
+        """
+        query = db.query(ProjectStatus.CTT_CUSTO).filter(ProjectStatus.is_finalized == True)
+        if custos is not None:
+            query = query.filter(func.trim(ProjectStatus.CTT_CUSTO).in_(custos))
+        try:
+            return {str(custo).strip() for (custo,) in query.all() if custo}
+        except Exception as e:
+            # Se a tabela não existir, nenhum projeto está finalizado
+            print(f"Aviso: Erro ao consultar projetos finalizados: {str(e)}")
+            db.rollback()
+            return set()
+
+    @staticmethod
+    def compute(db: Session, custos: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """Linhas do resumo calculadas das tabelas de origem (todas, ou só dos custos informados)."""
+        today = date.today()
+
+        def only(column):
+            return [column.in_(custos)] if custos is not None else []
+
+        projects = db.query(
+            CTT010.CTT_CUSTO, CTT010.CTT_SALINI, CTT010.CTT_DTINI, CTT010.CTT_DTFIM, CTT010.CTT_DTENC
+        ).filter(*only(CTT010.CTT_CUSTO)).all()
+
+        realized = ProjectSummaryService._sums_by_custo(
+            db, SE2010.E2_CUSTO,
+            [func.sum(func.coalesce(SE2010.E2_VALOR, 0))],
+            [SE2010.D_E_L_E_T_ != '*', *only(SE2010.E2_CUSTO)]
+        )
+        # Billed: installments with série and nota; pending: provisions still without them
+        invoiced = and_(
+            SC6010.C6_SERIE.isnot(None), SC6010.C6_SERIE != '',
+            SC6010.C6_NOTA.isnot(None), SC6010.C6_NOTA != ''
+        )
+        billing = ProjectSummaryService._sums_by_custo(
+            db, SC6010.C6_CUSTO,
+            [
+                func.sum(case((invoiced, func.coalesce(SC6010.C6_PRCVEN, 0)), else_=0)),
+                func.sum(case((invoiced, 0), else_=func.coalesce(SC6010.C6_PRCVEN, 0)))
+            ],
+            [SC6010.D_E_L_E_T_ != '*', *only(SC6010.C6_CUSTO)]
+        )
+        finalized = ProjectSummaryService._finalized_custos(db, custos)
+
+        rows = {}
+        for custo, salini, dtini, dtfim, dtenc in projects:
+            custo = (custo or "").strip()
+            if not custo:
+                continue
+            budget = float(salini or 0.0)
+            project_realized = realized.get(custo, (0.0,))[0]
+            billed, pending = billing.get(custo, (0.0, 0.0))
+            rows[custo] = {
+                "budget": budget,
+                "realized": project_realized,
+                "billed": billed,
+                "pending": pending,
+                "usage_percent": (project_realized / budget * 100) if budget > 0 else 0.0,
+                **status_fields(dtini, dtfim, dtenc, custo in finalized, today)
+            }
+        return rows
+
+    @staticmethod
+    def refresh(db: Session, custos: Optional[List[str]] = None) -> Tuple[int, int]:
+        """
+        Atualiza PROJECT_SUMMARY (inteira, ou só os custos informados), regravando apenas as
+        linhas que mudaram. Retorna (gravadas, removidas).
+        """
+        ProjectSummary.__table__.create(bind=engine_local, checkfirst=True)
+        if custos is not None:
+            custos = [str(custo).strip() for custo in custos]
+
+        rows = ProjectSummaryService.compute(db, custos)
+
+        stored_query = db.query(
+            ProjectSummary.CTT_CUSTO, *[getattr(ProjectSummary, field) for field in SUMMARY_FIELDS]
+        )
+        if custos is not None:
+            stored_query = stored_query.filter(ProjectSummary.CTT_CUSTO.in_(custos))
+        stored = {row[0]: dict(zip(SUMMARY_FIELDS, row[1:])) for row in stored_query.all()}
+
+        changed = [custo for custo, values in rows.items() if stored.get(custo) != values]
+        removed = [custo for custo in stored if custo not in rows]
+
+        stale = changed + removed
+        for i in range(0, len(stale), CHUNK_SIZE):
+            db.query(ProjectSummary).filter(
+                ProjectSummary.CTT_CUSTO.in_(stale[i:i + CHUNK_SIZE])
+            ).delete(synchronize_session=False)
+        if changed:
+            now = datetime.now()
+            db.execute(
+                ProjectSummary.__table__.insert(),
+                [{"CTT_CUSTO": custo, **rows[custo], "updated_at": now} for custo in changed]
+            )
+        db.commit()
+        if custos is None:
+            ProjectSummaryService._ready = bool(rows)
+        return len(changed), len(removed)
+
+    @staticmethod
+    def refresh_statuses(db: Session) -> int:
+        """
+        Recalcula só os campos de STATUS_FIELDS (status, dias restantes, finalização) de todas
+        as linhas, sem reagregar os movimentos. Retorna o número de linhas alteradas.
+        """
+        today = date.today()
+        projects = db.query(CTT010.CTT_CUSTO, CTT010.CTT_DTINI, CTT010.CTT_DTFIM, CTT010.CTT_DTENC).all()
+        finalized = ProjectSummaryService._finalized_custos(db)
+        current = {
+            custo.strip(): status_fields(dtini, dtfim, dtenc, custo.strip() in finalized, today)
+            for custo, dtini, dtfim, dtenc in projects if custo and custo.strip()
+        }
+        stored = db.query(ProjectSummary.CTT_CUSTO, *[getattr(ProjectSummary, field) for field in STATUS_FIELDS]).all()
+        changed = [
+            {"CTT_CUSTO": row[0], **current[row[0]]}
+            for row in stored
+            if row[0] in current and dict(zip(STATUS_FIELDS, row[1:])) != current[row[0]]
+        ]
+        if changed:
+            # Bulk UPDATE by primary key (executemany)
+            db.execute(update(ProjectSummary), changed)
+        db.commit()
+        return len(changed)
+
+    @staticmethod
+    def ensure_current() -> None:
+        """
+        Garante que status e dias restantes são de hoje: na primeira chamada de um novo dia (por
+        processo), recalcula as linhas calculadas em outro dia. Constrói o resumo se ele ainda
+        não existir.
+        """
+        today = date.today().strftime("%Y%m%d")
+        if ProjectSummaryService._current_on == today:
+            return
+        with ProjectSummaryService._status_lock:
+            if ProjectSummaryService._current_on == today:
+                return
+            db = SessionLocal()
+            try:
+                if not ProjectSummaryService.is_ready():
+                    changed, _ = ProjectSummaryService.refresh(db)
+                    logger.info(f"Project summary built: {changed} rows written")
+                    stale = False
+                else:
+                    stale = db.query(ProjectSummary.CTT_CUSTO).filter(
+                        ProjectSummary.computed_on != today
+                    ).first() is not None
+                if stale:
+                    changed = ProjectSummaryService.refresh_statuses(db)
+                    logger.info(f"Project statuses refreshed for {today}: {changed} rows changed")
+                ProjectSummaryService._current_on = today
+            except Exception as e:
+                db.rollback()
+                logger.error(f"Project status refresh failed: {e}")
+            finally:
+                db.close()
+
+    @staticmethod
+    def refresh_projects(custos: List[str]) -> None:
+        """Atualiza as linhas dos custos informados após uma alteração local (finalização, edição de CTT010)."""
+        with SessionLocal() as db:
+            try:
+                ProjectSummaryService.refresh(db, custos)
+            except Exception as e:
+                db.rollback()
+                print(f"Aviso: Erro ao atualizar PROJECT_SUMMARY: {str(e)}")
+
+    @staticmethod
+    def status_clause(status: str):
+        """
+        Critério para filtrar CTT010 pelo status pré-calculado (PROJECT_SUMMARY.status, indexado).
+        None se o status não for um dos do resumo; constrói o resumo se ele ainda não existir.
+        """
+        conditions = {
+            "in_execution": [ProjectSummary.status == "in_execution"],
+            "ending_soon": [
+                ProjectSummary.status == "in_execution",
+                ProjectSummary.days_remaining <= ENDING_SOON_DAYS
+            ],
+            "not_started": [ProjectSummary.status == "not_started"],
+            "rendering_accounts": [ProjectSummary.status == "rendering_accounts"],
+            "rendering_accounts_60days": [
+                ProjectSummary.status == "rendering_accounts",
+                ProjectSummary.days_remaining >= -RENDERING_ACCOUNTS_RECENT_DAYS
+            ],
+            "finalized": [ProjectSummary.status == "finalized"],
+            "closed": [ProjectSummary.status == "closed"],
+            "encerrado": [ProjectSummary.status == "closed"],
+        }.get(status)
+        if conditions is None:
+            return None
+        ProjectSummaryService.ensure_current()
+        if not ProjectSummaryService.is_ready():
+            return false()  # Resumo vazio (sem projetos) ou falha ao construí-lo (registrada)
+        return CTT010.CTT_CUSTO.in_(select(ProjectSummary.CTT_CUSTO).where(*conditions))
+
+    @staticmethod
+    def count_statuses(db: Session, filters: List[Any]) -> Optional[Dict[str, int]]:
+        """
+        Projetos de CTT010 (com os filtros informados) por status: um GROUP BY na coluna
+        pré-calculada. None se o resumo ainda não foi construído.
+        """
+        if not ProjectSummaryService.is_ready():
+            return None
+        ProjectSummaryService.ensure_current()
+        rows = db.query(
+            ProjectSummary.status,
+            func.count(CTT010.CTT_CUSTO),
+            func.sum(case((ProjectSummary.days_remaining <= ENDING_SOON_DAYS, 1), else_=0)),
+            func.sum(case((ProjectSummary.days_remaining >= -RENDERING_ACCOUNTS_RECENT_DAYS, 1), else_=0))
+        ).select_from(CTT010).outerjoin(
+            ProjectSummary, ProjectSummary.CTT_CUSTO == CTT010.CTT_CUSTO
+        ).filter(*filters).group_by(ProjectSummary.status).all()
+
+        counts = {name: 0 for name in ["total", *STATUSES, "ending_soon", "rendering_accounts_60days"]}
+        for status, count, ending_soon, recent in rows:
+            counts["total"] += count
+            if status in counts:
+                counts[status] += count
+            if status == "in_execution":
+                counts["ending_soon"] += int(ending_soon or 0)
+            elif status == "rendering_accounts":
+                counts["rendering_accounts_60days"] += int(recent or 0)
+        return counts
+
+    @staticmethod
+    def get_realized(db: Session, custos: List[str]) -> Dict[str, float]:
+        """
+        Realizado por custo (sem espaços): leitura por chave em PROJECT_SUMMARY, ou soma de
+        SE2010 enquanto o resumo não foi construído.
+        """
+        custos = [str(custo).strip() for custo in custos if custo]
+        if not custos:
+            return {}
+        realized = {}
+        try:
+            if ProjectSummaryService.is_ready():
+                for i in range(0, len(custos), CHUNK_SIZE):
+                    realized.update(
+                        db.query(ProjectSummary.CTT_CUSTO, ProjectSummary.realized).filter(
+                            ProjectSummary.CTT_CUSTO.in_(custos[i:i + CHUNK_SIZE])
+                        ).all()
+                    )
+                return {custo: float(value or 0.0) for custo, value in realized.items()}
+            for row in db.query(
+                SE2010.E2_CUSTO,
+                func.sum(func.coalesce(SE2010.E2_VALOR, 0))
+            ).filter(
+                SE2010.E2_CUSTO.in_(custos),
+                SE2010.D_E_L_E_T_ != '*'
+            ).group_by(SE2010.E2_CUSTO).all():
+                if row[0]:
+                    realized[row[0]] = float(row[1] or 0.0)
+        except Exception as e:
+            # Se a tabela SE2010 não existir ainda, retorna dict vazio
+            print(f"Warning: SE2010 table not available: {e}")
+        return realized
+
+    @staticmethod
+    def on_sync_completed(tables: List[str]) -> None:
+        """Listener do sync_service: atualiza o resumo após sincronizar CTT010, SE2010 ou SC6010."""
+        if not SUMMARY_SOURCE_TABLES.intersection(tables):
+            return
+        db = SessionLocal()
+        try:
+            changed, removed = ProjectSummaryService.refresh(db)
+            logger.info(f"Project summary refreshed: {changed} rows written, {removed} removed")
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Project summary refresh failed: {e}")
+        finally:
+            db.close()
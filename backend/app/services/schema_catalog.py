@@ -0,0 +1,310 @@
+"""
+Catálogo persistido do schema das tabelas sincronizadas.
+
+Guarda, por tabela, as colunas, os tipos locais, a chave primária e as decisões de conversão
+para float, junto com uma impressão digital do schema remoto. A reflexão completa do ERP
+(get_columns/get_pk_constraint) só é refeita quando essa impressão digital muda; nas demais
+execuções o schema sai da tabela SYNC_SCHEMA_CATALOG local.
+"""
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from sqlalchemy import text, inspect, Table, MetaData, Column, String, Text, DateTime, Float, Numeric
+from sqlalchemy import types as sqltypes
+from sqlalchemy.dialects import mssql
+from app.db.session import engine_remote, engine_local
+
+logger = logging.getLogger(__name__)
+
+# Fallback when the ERP table has no primary key constraint (same keys as app.models.protheus)
+MODEL_PRIMARY_KEYS = {
+    "CTT010": ["CTT_CUSTO"],
+    "PAD010": ["R_E_C_N_O_"],
+    "SC6010": ["R_E_C_N_O_"],
+    "SE1010": ["R_E_C_N_O_"],
+    "SE2010": ["R_E_C_N_O_"]
+}
+
+# Columns that only exist locally (filled by the sync from another remote column)
+LOCAL_ONLY_COLUMNS = {
+    "SE1010": [("E1_NUM", "VARCHAR(9)")]
+}
+
+_TYPE_PATTERN = re.compile(r"^\s*(\w+)\s*(?:\(([^)]*)\))?")
+
+
+def _type_to_str(col_type) -> str:
+    """Type as DDL of the local database, without collation."""
+    try:
+        compiled = col_type.compile(dialect=engine_local.dialect)
+    except Exception:
+        compiled = str(col_type)
+    return re.sub(r"\s+COLLATE\s+.*$", "", compiled, flags=re.IGNORECASE)
+
+
+def _type_from_str(type_str: str):
+    """Inverse of _type_to_str. Unknown types fall back to String()."""
+    match = _TYPE_PATTERN.match(type_str or "")
+    if not match:
+        return String()
+    name = match.group(1).upper()
+    type_cls = getattr(mssql, name, None) or getattr(sqltypes, name, None)
+    if not (isinstance(type_cls, type) and issubclass(type_cls, sqltypes.TypeEngine)):
+        return String()
+    # Numeric arguments only: VARCHAR(max) -> VARCHAR()
+    args = [int(a) for a in (match.group(2) or "").split(",") if a.strip().isdigit()]
+    try:
+        return type_cls(*args)
+    except TypeError:
+        return type_cls()
+
+
+class SchemaCatalog:
+    """Schema das tabelas sincronizadas, persistido localmente e versionado por fingerprint."""
+
+    CACHE_TTL = 300  # 5 minutos - entradas em memória usadas fora da sincronização
+
+    def __init__(self):
+        self.catalog_table = "SYNC_SCHEMA_CATALOG"
+        self._lock = threading.Lock()
+        self._memo: Dict[str, Any] = {}  # table_name -> (loaded_at, entry)
+        self._table_ready = False
+
+    def _ensure_catalog_table(self):
+        if self._table_ready:
+            return
+        try:
+            metadata = MetaData()
+            Table(
+                self.catalog_table, metadata,
+                Column('table_name', String(50), primary_key=True),
+                Column('fingerprint', String(64), nullable=True),
+                Column('schema_json', Text),
+                Column('updated_at', DateTime)
+            )
+            metadata.create_all(engine_local)
+            self._table_ready = True
+        except Exception as e:
+            logger.warning(f"Could not ensure schema catalog table: {e}")
+
+    # ------------------------------------------------------------------ remote
+    def remote_fingerprint(self, table_name: str) -> Optional[str]:
+        """
+        Cheap fingerprint of the remote table definition: a single query on the system
+        catalog instead of the several round-trips of a full reflection.
+        None when the dialect is not supported (the schema is then always reflected).
+        """
+        dialect = engine_remote.dialect.name
+        try:
+            with engine_remote.connect() as conn:
+                if dialect == "mssql":
+                    rows = conn.execute(text(
+                        "SELECT c.COLUMN_NAME, c.DATA_TYPE, c.CHARACTER_MAXIMUM_LENGTH, c.NUMERIC_PRECISION, c.NUMERIC_SCALE, "
+                        "CASE WHEN k.COLUMN_NAME IS NULL THEN 0 ELSE 1 END AS IS_PK "
+                        "FROM INFORMATION_SCHEMA.COLUMNS c "
+                        "LEFT JOIN INFORMATION_SCHEMA.TABLE_CONSTRAINTS t ON t.TABLE_SCHEMA = c.TABLE_SCHEMA "
+                        "AND t.TABLE_NAME = c.TABLE_NAME AND t.CONSTRAINT_TYPE = 'PRIMARY KEY' "
+                        "LEFT JOIN INFORMATION_SCHEMA.KEY_COLUMN_USAGE k ON k.CONSTRAINT_NAME = t.CONSTRAINT_NAME "
+                        "AND k.TABLE_SCHEMA = t.TABLE_SCHEMA AND k.COLUMN_NAME = c.COLUMN_NAME "
+                        "WHERE c.TABLE_SCHEMA = SCHEMA_NAME() AND c.TABLE_NAME = :table "
+                        "ORDER BY c.ORDINAL_POSITION"
+                    ), {"table": table_name}).fetchall()
+                elif dialect == "sqlite":
+                    rows = conn.execute(
+                        text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :table"),
+                        {"table": table_name}
+                    ).fetchall()
+                else:
+                    return None
+        except Exception as e:
+            logger.warning(f"Could not fingerprint remote schema of {table_name}: {e}")
+            return None
+        if not rows:
+            return None
+        return hashlib.md5(json.dumps([list(r) for r in rows], default=str).encode()).hexdigest()
+
+    def _reflect(self, table_name: str, fingerprint: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Full reflection of the remote table + the sync's type decisions."""
+        inspector = inspect(engine_remote)
+        columns = inspector.get_columns(table_name)
+        if not columns:
+            return None
+        logger.info(f"Discovered {len(columns)} columns for {table_name}.")
+
+        pk_columns = set(inspector.get_pk_constraint(table_name).get('constrained_columns', []))
+        if pk_columns:
+            logger.info(f"Found primary key columns: {', '.join(pk_columns)}")
+        elif table_name in MODEL_PRIMARY_KEYS:
+            pk_columns = set(MODEL_PRIMARY_KEYS[table_name])
+            logger.info(f"Using model-defined primary key: {', '.join(pk_columns)}")
+
+        planned = []
+        for col in columns:
+            col_type, to_float = self._plan_type(table_name, col['type'])
+            planned.append({
+                "name": col['name'],
+                "type": _type_to_str(col_type),
+                "collation": getattr(col_type, 'collation', None),
+                "primary_key": col['name'] in pk_columns,
+                "to_float": to_float
+            })
+        for name, type_str in LOCAL_ONLY_COLUMNS.get(table_name, []):
+            if not any(c["name"] == name for c in planned):
+                planned.append({"name": name, "type": type_str, "primary_key": False, "to_float": False, "local_only": True})
+
+        return {"table_name": table_name, "fingerprint": fingerprint, "columns": planned}
+
+    @staticmethod
+    def _plan_type(table_name: str, col_type):
+        """Local type of a remote column and whether its values must be converted to float."""
+        type_str = str(col_type).upper()
+        type_class_str = str(type(col_type)).upper()
+        is_numeric = (
+            isinstance(col_type, Numeric) or
+            'NUMERIC' in type_str or
+            'DECIMAL' in type_str or
+            'NUMERIC' in type_class_str or
+            'DECIMAL' in type_class_str
+        )
+        if not is_numeric:
+            return col_type, False
+        # For SE1010/SE2010, convert ALL numeric to Float to avoid precision issues
+        if table_name in ["SE1010", "SE2010"]:
+            return Float(), True
+        if isinstance(col_type, Numeric):
+            precision = getattr(col_type, 'precision', None)
+            scale = getattr(col_type, 'scale', None)
+            if precision == 0 or precision is None or scale is None:
+                return Float(), True
+            return col_type, False
+        # If we can't determine, convert to Float to be safe
+        return Float(), True
+
+    # ------------------------------------------------------------------ local
+    def _load(self, table_name: str) -> Optional[Dict[str, Any]]:
+        self._ensure_catalog_table()
+        try:
+            with engine_local.connect() as conn:
+                row = conn.execute(
+                    text(f"SELECT fingerprint, schema_json FROM {self.catalog_table} WHERE table_name = :table"),
+                    {"table": table_name}
+                ).first()
+        except Exception as e:
+            logger.warning(f"Could not read schema catalog for {table_name}: {e}")
+            return None
+        if not row:
+            return None
+        entry = json.loads(row.schema_json)
+        entry["fingerprint"] = row.fingerprint
+        return entry
+
+    def _save(self, entry: Dict[str, Any]) -> None:
+        self._ensure_catalog_table()
+        try:
+            with engine_local.begin() as conn:
+                conn.execute(text(f"DELETE FROM {self.catalog_table} WHERE table_name = :table"), {"table": entry["table_name"]})
+                conn.execute(
+                    text(
+                        f"INSERT INTO {self.catalog_table} (table_name, fingerprint, schema_json, updated_at) "
+                        f"VALUES (:table, :fingerprint, :schema_json, :updated_at)"
+                    ),
+                    {
+                        "table": entry["table_name"],
+                        "fingerprint": entry["fingerprint"],
+                        "schema_json": json.dumps(entry),
+                        "updated_at": datetime.now()
+                    }
+                )
+        except Exception as e:
+            logger.error(f"Error saving schema catalog for {entry['table_name']}: {e}")
+
+    def _remember(self, table_name: str, entry: Optional[Dict[str, Any]]) -> None:
+        with self._lock:
+            if entry is None:
+                self._memo.pop(table_name, None)
+            else:
+                self._memo[table_name] = (time.monotonic(), entry)
+
+    # ------------------------------------------------------------------ API
+    def get_sync_schema(self, table_name: str) -> Optional[Dict[str, Any]]:
+        """
+        Schema to sync a table with. Served from the catalog while the remote fingerprint
+        is unchanged; reflected (and stored) otherwise. None if the remote table is missing.
+        """
+        fingerprint = self.remote_fingerprint(table_name)
+        if fingerprint is not None:
+            stored = self._load(table_name)
+            if stored and stored.get("fingerprint") == fingerprint:
+                logger.info(f"Remote schema of {table_name} unchanged. Using catalog ({len(stored['columns'])} columns).")
+                self._remember(table_name, stored)
+                return stored
+
+        entry = self._reflect(table_name, fingerprint)
+        if entry is not None:
+            self._save(entry)
+        self._remember(table_name, entry)
+        return entry
+
+    def get_local_schema(self, table_name: str) -> Optional[Dict[str, Any]]:
+        """
+        Schema of a local (synced) table without reflection: memory, then the catalog,
+        then - for tables the sync never cataloged - one inspection of engine_local.
+        """
+        with self._lock:
+            cached = self._memo.get(table_name)
+        if cached and time.monotonic() - cached[0] < self.CACHE_TTL:
+            return cached[1]
+
+        entry = self._load(table_name)
+        if entry is None:
+            try:
+                local_inspector = inspect(engine_local)
+                columns = local_inspector.get_columns(table_name)
+                if not columns:
+                    return None
+                pk_columns = set(local_inspector.get_pk_constraint(table_name).get('constrained_columns', []))
+            except Exception as e:
+                logger.warning(f"Could not inspect local {table_name}: {e}")
+                return None
+            entry = {
+                "table_name": table_name,
+                "fingerprint": None,
+                "columns": [
+                    {
+                        "name": c['name'],
+                        "type": _type_to_str(c['type']),
+                        "collation": getattr(c['type'], 'collation', None),
+                        "primary_key": c['name'] in pk_columns,
+                        "to_float": False
+                    }
+                    for c in columns
+                ]
+            }
+        self._remember(table_name, entry)
+        return entry
+
+    @staticmethod
+    def build_columns(entry: Dict[str, Any], primary_keys: bool = True) -> List[Column]:
+        """SQLAlchemy columns (fresh objects, ready for a new MetaData) for a catalog entry."""
+        columns = []
+        for c in entry["columns"]:
+            col_type = _type_from_str(c["type"])
+            if c.get("collation") and hasattr(col_type, "collation"):
+                col_type.collation = c["collation"]  # keep the ERP collation (comparisons, padding)
+            columns.append(Column(
+                c["name"], col_type,
+                primary_key=primary_keys and c["primary_key"], autoincrement=False, nullable=True
+            ))
+        return columns
+
+    @staticmethod
+    def primary_key(entry: Dict[str, Any]) -> Optional[str]:
+        return next((c["name"] for c in entry["columns"] if c["primary_key"]), None)
+
+
+schema_catalog = SchemaCatalog()
@@ -0,0 +1,161 @@
+"""
+Dimensionamento adaptativo dos lotes de INSERT da sincronização.
+
+O tamanho inicial vem do número de colunas e do limite de 2100 parâmetros por comando do
+SQL Server. Enquanto a latência por linha se mantém estável o lote dobra; se a latência
+dispara, o lote é reduzido. Lotes com erro são divididos ao meio (bisseção) até isolar as
+linhas problemáticas, em vez de regravar o lote inteiro linha a linha. Cada tentativa pode
+rodar dentro de um savepoint: um executemany que falha no meio é desfeito antes da bisseção,
+para que as linhas já gravadas não sejam regravadas (e contadas como erro) pelas metades.
+"""
+import logging
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, ContextManager, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+SQLSERVER_MAX_PARAMS = 2100
+
+
+class AdaptiveBatcher:
+    """Escolhe o tamanho do próximo lote a partir da latência observada."""
+
+    GROWTH_TOLERANCE = 1.25  # até 25% acima da melhor latência/linha ainda conta como "estável"
+    SHRINK_THRESHOLD = 2.0   # acima do dobro da melhor latência/linha, o lote diminui
+
+    def __init__(self, column_count: int, max_cells: int = 200_000, max_rows: int = 20_000):
+        column_count = max(1, column_count)
+        self.min_size = max(1, (SQLSERVER_MAX_PARAMS - 1) // column_count)
+        self.max_size = max(self.min_size, min(max_rows, max_cells // column_count))
+        self.size = self.min_size
+        self.best_row_latency: Optional[float] = None
+        self.failed_batches = 0
+        self.bad_rows = 0
+        self._savepoint: Optional[Callable[[], ContextManager]] = None
+
+    def record(self, rows: int, seconds: float) -> None:
+        """Registra a latência de um lote gravado com sucesso e ajusta o próximo tamanho."""
+        if rows <= 0:
+            return
+        row_latency = seconds / rows
+        if self.best_row_latency is None or row_latency < self.best_row_latency:
+            self.best_row_latency = row_latency
+
+        if row_latency <= self.best_row_latency * self.GROWTH_TOLERANCE:
+            if rows >= self.size:  # só cresce quando o lote cheio foi medido
+                self.size = min(self.size * 2, self.max_size)
+        elif row_latency >= self.best_row_latency * self.SHRINK_THRESHOLD:
+            self.size = max(self.size // 2, self.min_size)
+
+    def insert_all(
+        self,
+        rows: Sequence[Any],
+        execute_many: Callable[[Sequence[Any]], None],
+        describe_row: Callable[[Any], str] = repr,
+        savepoint: Optional[Callable[[], ContextManager]] = None
+    ) -> int:
+        """
+        Grava todas as linhas em lotes adaptativos. Retorna quantas foram gravadas.
+        savepoint: fábrica de context managers que desfazem a tentativa se ela falhar.
+        """
+        self._savepoint = savepoint
+        written = 0
+        start = 0
+        while start < len(rows):
+            batch = rows[start:start + self.size]
+            started = time.perf_counter()
+            try:
+                self._attempt(batch, execute_many)
+                self.record(len(batch), time.perf_counter() - started)
+                written += len(batch)
+            except Exception as batch_error:
+                self.failed_batches += 1
+                logger.warning(f"Batch of {len(batch)} rows failed ({batch_error}). Bisecting to find bad rows...")
+                written += self._bisect(batch, execute_many, describe_row)
+            start += len(batch)
+        return written
+
+    def _attempt(self, rows: Sequence[Any], execute_many: Callable[[Sequence[Any]], None]) -> None:
+        """Executa um lote; com savepoint, um lote que falha não deixa linhas gravadas."""
+        if self._savepoint is None:
+            execute_many(rows)
+            return
+        with self._savepoint():
+            execute_many(rows)
+
+    def _bisect(
+        self,
+        rows: Sequence[Any],
+        execute_many: Callable[[Sequence[Any]], None],
+        describe_row: Callable[[Any], str]
+    ) -> int:
+        if len(rows) == 1:
+            try:
+                self._attempt(rows, execute_many)
+                return 1
+            except Exception as row_error:
+                self.bad_rows += 1
+                logger.warning(f"Skipping bad row {describe_row(rows[0])}: {row_error}")
+                return 0
+
+        middle = len(rows) // 2
+        written = 0
+        for half in (rows[:middle], rows[middle:]):
+            try:
+                self._attempt(half, execute_many)
+                written += len(half)
+            except Exception:
+                self.failed_batches += 1
+                written += self._bisect(half, execute_many, describe_row)
+        return written
+
+
+def open_transaction_count(raw_conn) -> int:
+    """@@TRANCOUNT de uma conexão pyodbc com o SQL Server."""
+    cursor = raw_conn.cursor()
+    try:
+        cursor.execute("SELECT @@TRANCOUNT")
+        return int(cursor.fetchone()[0])
+    finally:
+        cursor.close()
+
+
+def dbapi_savepoint(raw_conn, dialect_name: str, table_name: str) -> Callable[[], ContextManager]:
+    """
+    Fábrica de savepoints para insert_all em uma conexão DBAPI com autocommit desligado. A
+    tentativa que falha é desfeita até o savepoint; a transação do bloco continua aberta e é
+    confirmada uma única vez por quem a abriu.
+    """
+    mssql = dialect_name == "mssql"
+
+    @contextmanager
+    def savepoint():
+        cursor = raw_conn.cursor()
+        try:
+            if mssql:
+                if open_transaction_count(raw_conn) == 0:
+                    # pyodbc runs with IMPLICIT_TRANSACTIONS ON: SAVE TRANSACTION needs an open
+                    # transaction, and an explicit BEGIN TRANSACTION would open two nested ones
+                    # (@@TRANCOUNT = 2) that the chunk's single commit doesn't close. A SELECT
+                    # from a table opens exactly one.
+                    cursor.execute(f"SELECT TOP (0) 1 FROM [{table_name}]")
+                    cursor.fetchall()
+                cursor.execute("SAVE TRANSACTION sync_batch")
+            else:
+                if not getattr(raw_conn, "in_transaction", True):
+                    # Releasing an outermost SQLite savepoint would commit the chunk early
+                    cursor.execute("BEGIN")
+                cursor.execute("SAVEPOINT sync_batch")
+            try:
+                yield
+            except Exception:
+                cursor.execute("ROLLBACK TRANSACTION sync_batch" if mssql else "ROLLBACK TO sync_batch")
+                if not mssql:
+                    cursor.execute("RELEASE sync_batch")
+                raise
+            if not mssql:
+                cursor.execute("RELEASE sync_batch")
+        finally:
+            cursor.close()
+    return savepoint
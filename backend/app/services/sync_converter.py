@@ -0,0 +1,77 @@
+"""
+Conversão coluna a coluna dos lotes sincronizados.
+
+O conversor é compilado uma vez por tabela a partir do schema descoberto e converte lotes
+inteiros de fetchmany: as linhas são transpostas em colunas, só as colunas numéricas passam
+por pandas/NumPy, e o resultado volta como tuplas prontas para o executemany. As colunas
+de chave (custo) chegam do Protheus completadas com espaços e são gravadas já sem eles.
+"""
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+import numpy as np
+import pandas as pd
+
+
+class RowConverter:
+    """Conversor de lotes compilado a partir do schema de uma tabela."""
+
+    def __init__(
+        self,
+        source_columns: Sequence[str],
+        target_columns: Sequence[str],
+        float_columns: Iterable[str],
+        derived_columns: Optional[Dict[str, str]] = None,
+        trim_columns: Iterable[str] = ()
+    ):
+        """
+        - source_columns: ordem das colunas do SELECT * remoto
+        - target_columns: ordem das colunas do INSERT local
+        - float_columns: colunas convertidas para float (valores inválidos viram None)
+        - derived_columns: coluna destino -> coluna origem copiada (ex.: E1_NUM <- E1_NOTA)
+        - trim_columns: colunas de texto gravadas sem os espaços do CHAR do Protheus
+        """
+        source_index = {name: i for i, name in enumerate(source_columns)}
+        float_set = set(float_columns)
+        trim_set = set(trim_columns)
+        derived = derived_columns or {}
+
+        # Plano: para cada coluna destino, (índice da coluna origem ou None, converte para float?, remove espaços?)
+        self.plan = []
+        for name in target_columns:
+            source_name = derived.get(name, name)
+            self.plan.append((source_index.get(source_name), source_name in float_set, name in trim_set))
+        self.width = len(target_columns)
+
+    @staticmethod
+    def _to_float_column(values: Sequence[Any]) -> Sequence[Any]:
+        """Decimal/str/int -> float em uma operação vetorizada. Nulos, inválidos e infinitos -> None."""
+        floats = pd.to_numeric(pd.Series(values, dtype=object), errors="coerce").to_numpy(dtype=float)
+        result = floats.astype(object)  # floats Python, aceitos diretamente pelo pyodbc
+        result[~np.isfinite(floats)] = None
+        return result
+
+    @staticmethod
+    def _trim_column(values: Sequence[Any]) -> Sequence[Any]:
+        """Remove os espaços das pontas dos textos ('001010167   ' -> '001010167'). Nulos ficam nulos."""
+        return [value.strip() if isinstance(value, str) else value for value in values]
+
+    def convert(self, rows: Sequence[Sequence[Any]]) -> List[tuple]:
+        """Converte um lote de linhas remotas em tuplas na ordem das colunas locais."""
+        if not rows:
+            return []
+
+        source = list(zip(*rows))  # transposição feita em C
+        row_count = len(rows)
+        empty_column = (None,) * row_count
+
+        columns = []
+        for index, to_float, trim in self.plan:
+            if index is None:
+                columns.append(empty_column)
+            elif to_float:
+                columns.append(self._to_float_column(source[index]))
+            elif trim:
+                columns.append(self._trim_column(source[index]))
+            else:
+                columns.append(source[index])
+
+        return list(zip(*columns))
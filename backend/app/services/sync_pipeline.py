@@ -0,0 +1,189 @@
+"""
+Pipeline de três estágios para a sincronização: fetch remoto -> conversão -> insert local.
+
+Cada estágio roda em sua própria thread e troca lotes por filas limitadas, de modo que o
+fetchmany remoto continua trabalhando enquanto o executemany local grava (e vice-versa).
+As filas cheias bloqueiam o estágio anterior (backpressure), limitando a memória usada.
+"""
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_END = object()  # Sentinela de fim de stream
+
+
+def estimate_batch_bytes(rows: List[Any], sample_size: int = 32) -> int:
+    """Tamanho aproximado de um lote, extrapolado de uma amostra de linhas espaçadas."""
+    if not rows:
+        return 0
+    sample = rows[::max(1, len(rows) // sample_size)]
+    sampled = 0
+    for row in sample:
+        for value in row:
+            if value is None:
+                continue
+            sampled += len(value) if isinstance(value, (str, bytes, bytearray)) else 8
+    return int(sampled * len(rows) / len(sample))
+
+
+class StageStats:
+    """Contadores de um estágio: linhas processadas, bytes (estimados) e tempo efetivamente ocupado."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.rows = 0
+        self.batches = 0
+        self.bytes = 0
+        self.busy_seconds = 0.0
+
+    def add(self, rows: int, seconds: float, size: int = 0) -> None:
+        self.rows += rows
+        self.batches += 1
+        self.bytes += size
+        self.busy_seconds += seconds
+
+    def merge(self, other: "StageStats") -> None:
+        self.rows += other.rows
+        self.batches += other.batches
+        self.bytes += other.bytes
+        self.busy_seconds += other.busy_seconds
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.busy_seconds if self.busy_seconds > 0 else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "rows": self.rows,
+            "batches": self.batches,
+            "bytes": self.bytes,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "rows_per_second": round(self.rows_per_second, 1)
+        }
+
+    def __str__(self) -> str:
+        return f"{self.name}: {self.rows} rows in {self.busy_seconds:.2f}s ({self.rows_per_second:.0f} rows/s)"
+
+
+class SyncPipeline:
+    """
+    Executa fetch, conversão e insert como produtor/consumidor.
+
+    - fetch_batches: gerador de lotes de linhas remotas. Roda inteiro na thread de fetch,
+      então deve abrir a conexão remota dentro dele.
+    - convert: recebe um lote remoto e devolve as tuplas prontas para o executemany.
+    - insert: grava um lote convertido e devolve quantas linhas foram gravadas. Roda na
+      thread que chamou run(), junto com a conexão local que ela abriu.
+    """
+
+    def __init__(
+        self,
+        label: str,
+        fetch_batches: Callable[[], Iterable[List[Any]]],
+        convert: Callable[[List[Any]], List[tuple]],
+        insert: Callable[[List[tuple]], int],
+        queue_size: int = 4
+    ):
+        self.label = label
+        self.fetch_batches = fetch_batches
+        self.convert = convert
+        self.insert = insert
+        self.fetched_queue: "queue.Queue[Any]" = queue.Queue(maxsize=queue_size)
+        self.converted_queue: "queue.Queue[Any]" = queue.Queue(maxsize=queue_size)
+        self.stats = {
+            "fetch": StageStats("fetch"),
+            "convert": StageStats("convert"),
+            "insert": StageStats("insert")
+        }
+        self._stop = threading.Event()
+        self._error: Optional[BaseException] = None
+
+    def _fail(self, error: BaseException) -> None:
+        if self._error is None:
+            self._error = error
+        self._stop.set()
+
+    def _put(self, q: "queue.Queue[Any]", item: Any) -> bool:
+        """Put com backpressure que desiste se outro estágio falhou."""
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q: "queue.Queue[Any]") -> Any:
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.5)
+            except queue.Empty:
+                continue
+        return _END
+
+    def _fetch_stage(self) -> None:
+        stats = self.stats["fetch"]
+        try:
+            iterator = iter(self.fetch_batches())
+            while not self._stop.is_set():
+                started = time.perf_counter()
+                batch = next(iterator, None)
+                if not batch:
+                    break
+                stats.add(len(batch), time.perf_counter() - started, estimate_batch_bytes(batch))
+                if not self._put(self.fetched_queue, batch):
+                    return
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            self._put(self.fetched_queue, _END)
+
+    def _convert_stage(self) -> None:
+        stats = self.stats["convert"]
+        try:
+            while True:
+                batch = self._get(self.fetched_queue)
+                if batch is _END:
+                    break
+                started = time.perf_counter()
+                converted = self.convert(batch)
+                stats.add(len(converted), time.perf_counter() - started)
+                if not self._put(self.converted_queue, converted):
+                    return
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            self._put(self.converted_queue, _END)
+
+    def run(self) -> Dict[str, StageStats]:
+        """Roda o pipeline até o fim do stream. Relança o primeiro erro de qualquer estágio."""
+        fetch_thread = threading.Thread(target=self._fetch_stage, name=f"{self.label}-fetch", daemon=True)
+        convert_thread = threading.Thread(target=self._convert_stage, name=f"{self.label}-convert", daemon=True)
+        fetch_thread.start()
+        convert_thread.start()
+
+        stats = self.stats["insert"]
+        try:
+            while True:
+                converted = self._get(self.converted_queue)
+                if converted is _END:
+                    break
+                started = time.perf_counter()
+                written = self.insert(converted)
+                stats.add(written, time.perf_counter() - started)
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            self._stop.set()
+            fetch_thread.join()
+            convert_thread.join()
+
+        if self._error is not None:
+            raise self._error
+
+        logger.info(f"[{self.label}] " + " | ".join(str(s) for s in self.stats.values()))
+        return self.stats
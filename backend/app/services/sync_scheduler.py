@@ -0,0 +1,273 @@
+"""
+Agendador de sincronização embutido na API.
+
+Cada tabela tem uma política de atualização (ex.: SE2010 incremental a cada 15 minutos,
+CTT010 completa a cada hora, PAD010 completa toda noite). O laço roda no event loop do
+FastAPI e executa a sincronização em uma thread. Um lock com lease no banco local garante que
+só um worker (ou o sync_tables.py) sincroniza por vez, e os jobs que vencem juntos são
+escalonados para não gerar picos de carga no ERP.
+"""
+import asyncio
+import logging
+import os
+import re
+import socket
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from sqlalchemy import text, Table, MetaData, Column, String, DateTime
+from sqlalchemy.exc import IntegrityError
+from app.db.session import engine_local
+from app.core.config import settings
+from app.models.sync import SyncRunHistory
+
+logger = logging.getLogger(__name__)
+
+_POLICY_PATTERN = re.compile(r"^(\w+)=(?:(\d+)m|daily@(\d{1,2}):(\d{2})):(full|incremental)$")
+
+
+def parse_schedule(spec: str) -> List[Dict[str, Any]]:
+    """
+    "SE2010=15m:incremental,PAD010=daily@02:00:full" -> lista de políticas.
+    Uma tabela pode ter mais de uma política (ex.: incremental a cada 15 min + completa à noite).
+    """
+    policies = []
+    for item in (spec or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        match = _POLICY_PATTERN.match(item)
+        if not match:
+            logger.warning(f"Ignoring invalid sync policy '{item}'")
+            continue
+        table_name, minutes, hour, minute, mode = match.groups()
+        policies.append({
+            "table_name": table_name.upper(),
+            "mode": mode,
+            "interval": timedelta(minutes=int(minutes)) if minutes else None,
+            "daily_at": (int(hour), int(minute)) if hour is not None else None
+        })
+    return policies
+
+
+class SyncLock:
+    """
+    Lock entre processos com lease (tabela SYNC_LOCK no banco local). Se o dono morrer,
+    o lock expira sozinho depois de ttl_seconds; enquanto sincroniza, o dono renova o lease.
+    Se uma renovação falhar, lost é marcado: o dono termina o job atual e não sincroniza mais nada.
+    """
+
+    def __init__(self, name: str = "sync", ttl_seconds: int = 300):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.table = "SYNC_LOCK"
+        self._table_ready = False
+        self.lost = threading.Event()  # A renewal failed: the lease may already belong to another owner
+
+    def _ensure_table(self):
+        if self._table_ready:
+            return
+        metadata = MetaData()
+        Table(
+            self.table, metadata,
+            Column('name', String(50), primary_key=True),
+            Column('owner', String(100)),
+            Column('acquired_at', DateTime),
+            Column('expires_at', DateTime)
+        )
+        metadata.create_all(engine_local)
+        self._table_ready = True
+
+    def acquire(self) -> bool:
+        """Takes (or renews) the lock. Returns False if another owner holds a valid lease."""
+        try:
+            self._ensure_table()
+            now = datetime.now()
+            params = {"name": self.name, "owner": self.owner, "now": now, "expires": now + timedelta(seconds=self.ttl_seconds)}
+            with engine_local.begin() as conn:
+                result = conn.execute(
+                    text(
+                        f"UPDATE {self.table} SET owner = :owner, acquired_at = :now, expires_at = :expires "
+                        f"WHERE name = :name AND (owner = :owner OR expires_at < :now)"
+                    ),
+                    params
+                )
+                if result.rowcount:
+                    return True
+            with engine_local.begin() as conn:
+                conn.execute(
+                    text(f"INSERT INTO {self.table} (name, owner, acquired_at, expires_at) VALUES (:name, :owner, :now, :expires)"),
+                    params
+                )
+            return True
+        except IntegrityError:
+            return False  # Row exists and its lease is still valid
+        except Exception as e:
+            logger.error(f"Error acquiring sync lock: {e}")
+            return False
+
+    def renew(self) -> bool:
+        """Renews the lease. On failure marks the lock as lost and returns False."""
+        if self.acquire():
+            return True
+        self.lost.set()
+        logger.error(f"Could not renew sync lock '{self.name}': stopping after the current job")
+        return False
+
+    def release(self) -> None:
+        self.lost.clear()
+        try:
+            with engine_local.begin() as conn:
+                conn.execute(
+                    text(f"DELETE FROM {self.table} WHERE name = :name AND owner = :owner"),
+                    {"name": self.name, "owner": self.owner}
+                )
+        except Exception as e:
+            logger.error(f"Error releasing sync lock: {e}")
+
+    @contextmanager
+    def hold(self):
+        """with sync_lock.hold() as acquired: ... (for synchronous callers like sync_tables.py).
+        The lease is renewed by a background thread while the block runs; once a renewal
+        fails, lost is set and the block should not start further work."""
+        acquired = self.acquire()
+        stop = threading.Event()
+        if acquired:
+            def renew():
+                while not stop.wait(max(1, self.ttl_seconds // 3)):
+                    if not self.renew():
+                        return
+            threading.Thread(target=renew, name="sync-lock-renew", daemon=True).start()
+        try:
+            yield acquired
+        finally:
+            stop.set()
+            if acquired:
+                self.release()
+
+
+class SyncScheduler:
+    """Laço assíncrono que dispara as sincronizações vencidas segundo as políticas."""
+
+    def __init__(self, policies: List[Dict[str, Any]], lock: SyncLock):
+        self.policies = policies
+        self.lock = lock
+        self._task: Optional[asyncio.Task] = None
+        self._history_ready = False
+
+    def last_run(self, table_name: str, full_only: bool) -> Optional[datetime]:
+        """Start of the last sync of a table (SYNC_RUN_HISTORY is shared by all workers and the CLI)."""
+        sql = "SELECT MAX(started_at) FROM SYNC_RUN_HISTORY WHERE table_name = :table"
+        if full_only:
+            sql += " AND mode = 'full'"  # A full sync also satisfies incremental policies
+        try:
+            if not self._history_ready:
+                SyncRunHistory.__table__.create(bind=engine_local, checkfirst=True)
+                self._history_ready = True
+            with engine_local.connect() as conn:
+                return conn.execute(text(sql), {"table": table_name}).scalar()
+        except Exception as e:
+            logger.warning(f"Could not read sync history for {table_name}: {e}")
+            return None
+
+    def is_due(self, policy: Dict[str, Any], now: Optional[datetime] = None) -> bool:
+        now = now or datetime.now()
+        last = self.last_run(policy["table_name"], full_only=policy["mode"] == "full")
+        if last is None:
+            return True
+        if isinstance(last, str):  # SQLite returns aggregates of DATETIME columns as text
+            last = datetime.fromisoformat(last)
+        if policy["interval"] is not None:
+            return now - last >= policy["interval"]
+        hour, minute = policy["daily_at"]
+        scheduled = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if scheduled > now:
+            scheduled -= timedelta(days=1)
+        return last < scheduled
+
+    def due_jobs(self) -> List[Dict[str, Any]]:
+        """Due policies, one per table, full before incremental."""
+        due: Dict[str, Dict[str, Any]] = {}
+        for policy in sorted(self.policies, key=lambda p: p["mode"] != "full"):
+            if policy["table_name"] not in due and self.is_due(policy):
+                due[policy["table_name"]] = policy
+        return list(due.values())
+
+    async def _keep_lock(self):
+        while True:
+            await asyncio.sleep(max(1, self.lock.ttl_seconds // 3))
+            if not await asyncio.to_thread(self.lock.renew):
+                return
+
+    async def run_due_jobs(self) -> int:
+        """Runs the due jobs one at a time, spaced by the stagger. Returns how many ran."""
+        jobs = await asyncio.to_thread(self.due_jobs)
+        if not jobs:
+            return 0
+        if not await asyncio.to_thread(self.lock.acquire):
+            logger.info("Sync scheduler: another worker is syncing. Skipping this tick.")
+            return 0
+
+        from app.services.sync_service import sync_service  # heavy import, only when a job runs
+
+        keeper = asyncio.create_task(self._keep_lock())
+        ran = 0
+        try:
+            for job in jobs:
+                if ran:
+                    await asyncio.sleep(settings.SYNC_SCHEDULER_STAGGER_SECONDS)
+                if self.lock.lost.is_set():
+                    logger.warning("Sync scheduler: sync lock lost. Skipping the remaining jobs.")
+                    break
+                # Another worker may have synced it while we waited for the lock
+                if not await asyncio.to_thread(self.is_due, job):
+                    continue
+                logger.info(f"Sync scheduler: {job['table_name']} ({job['mode']}) is due.")
+                await asyncio.to_thread(
+                    sync_service.sync_all, force=True, mode=job["mode"], tables=[job["table_name"]]
+                )
+                ran += 1
+        finally:
+            keeper.cancel()
+            await asyncio.to_thread(self.lock.release)
+        return ran
+
+    async def _loop(self):
+        await asyncio.sleep(settings.SYNC_SCHEDULER_INITIAL_DELAY_SECONDS)
+        while True:
+            try:
+                await self.run_due_jobs()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Sync scheduler error: {e}")
+            await asyncio.sleep(settings.SYNC_SCHEDULER_TICK_SECONDS)
+
+    def start(self):
+        if self._task is None:
+            logger.info(
+                "Sync scheduler started: " + ", ".join(
+                    f"{p['table_name']} {p['mode']} " + (
+                        f"every {int(p['interval'].total_seconds() // 60)}m" if p["interval"] else
+                        f"daily at {p['daily_at'][0]:02d}:{p['daily_at'][1]:02d}"
+                    )
+                    for p in self.policies
+                )
+            )
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+sync_lock = SyncLock(ttl_seconds=settings.SYNC_SCHEDULER_LOCK_TTL_SECONDS)
+sync_scheduler = SyncScheduler(parse_schedule(settings.SYNC_SCHEDULE), sync_lock)
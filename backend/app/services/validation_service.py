@@ -4,12 +4,14 @@ from typing import Dict, Any, Optional
 from sqlalchemy import text, inspect, Table, MetaData, Column, String, Integer, DateTime, Float, Date
 from app.db.session import engine_local, engine_validated, SessionLocal, SessionValidated
 from app.models.validation import ValidationStatus, Base
+from app.services.schema_catalog import schema_catalog
 
 logger = logging.getLogger(__name__)
 
 class ValidationService:
     def __init__(self):
         self.tables = ["CTT010", "PAD010"]
+        self._validated_tables = set()  # Tables already known to exist in the validated database
         self._ensure_validation_table()
     
     def _ensure_validation_table(self):
@@ -21,33 +23,31 @@ class ValidationService:
     
     def _ensure_validated_table(self, table_name: str):
         """Create table in validated database if not exists."""
+        if table_name in self._validated_tables:
+            return True
         try:
-            inspector = inspect(engine_local)
-            columns = inspector.get_columns(table_name)
+            schema = schema_catalog.get_local_schema(table_name)
             
-            if not columns:
+            if not schema:
                 logger.warning(f"Table {table_name} not found in local database.")
                 return False
             
             # Check if table exists in validated database
             validated_inspector = inspect(engine_validated)
             if validated_inspector.has_table(table_name):
+                self._validated_tables.add(table_name)
                 return True
             
-            # Create table in validated database
+            # Create table in validated database (same columns as the synced table, no key,
+            # like the reflected copy it used to be built from)
             validated_metadata = MetaData()
-            safe_columns = []
-            for col in columns:
-                col_name = col['name']
-                col_type = col['type']
-                # Preserve primary key
-                is_primary = col.get('primary_key', False)
-                safe_columns.append(Column(col_name, col_type, primary_key=is_primary, autoincrement=False))
+            safe_columns = schema_catalog.build_columns(schema, primary_keys=False)
             
             validated_table = Table(table_name, validated_metadata, *safe_columns)
             validated_metadata.create_all(engine_validated)
             
             logger.info(f"Created table {table_name} in validated database.")
+            self._validated_tables.add(table_name)
             return True
         except Exception as e:
             logger.error(f"Error ensuring validated table {table_name}: {e}")
@@ -126,10 +126,9 @@ class ValidationService:
             if not self._ensure_validated_table(table_name):
                 return False
             
-            # Get column names from local table
-            inspector = inspect(engine_local)
-            columns = inspector.get_columns(table_name)
-            col_names = [col['name'] for col in columns]
+            # Get column names from the schema catalog (no reflection per approval)
+            schema = schema_catalog.get_local_schema(table_name)
+            col_names = [col['name'] for col in schema['columns']]
             
             # Prepare data for insertion
             insert_data = {}
@@ -156,9 +155,8 @@ class ValidationService:
         """Update a record in the local database."""
         try:
             # Determine primary key column
-            inspector = inspect(engine_local)
-            pk_columns = inspector.get_pk_constraint(table_name)
-            pk_column = pk_columns['constrained_columns'][0] if pk_columns['constrained_columns'] else None
+            schema = schema_catalog.get_local_schema(table_name)
+            pk_column = schema_catalog.primary_key(schema) if schema else None
             
             if not pk_column:
                 logger.error(f"No primary key found for table {table_name}")
@@ -20,6 +20,7 @@ def create_performance_indexes():
     # Índices críticos para performance
     indices_necessarios = {
         "CTT010": [
+            ("CTT_CUSTO", "Índice para buscas e joins por custo"),
             ("CTT_DTINI", "Índice para filtros por data de início"),
             ("CTT_DTFIM", "Índice para filtros por data de fim"),
             ("CTT_DTINI", "CTT_DTFIM", "Índice composto para queries de vigência"),
@@ -50,6 +51,9 @@ def create_performance_indexes():
         columns_info = inspector.get_columns(table_name)
         existing_columns = [col['name'] for col in columns_info]
         
+        # Chave primária local (vem do ERP: normalmente R_E_C_N_O_ no Protheus)
+        primary_key_columns = inspector.get_pk_constraint(table_name).get("constrained_columns") or []
+        
         for index_spec in columns_list:
             if isinstance(index_spec, tuple):
                 if len(index_spec) == 2 and isinstance(index_spec[1], str):
@@ -81,6 +85,10 @@ def create_performance_indexes():
                 print(f"   ✅ Índice {index_name} já existe")
                 continue
             
+            if columns == primary_key_columns:
+                print(f"   ✅ {', '.join(columns)} já é a chave primária de {table_name}")
+                continue
+            
             # Verificar se todas as colunas existem
             missing_columns = [col for col in columns if col not in existing_columns]
             if missing_columns:
@@ -4,15 +4,35 @@ import os
 # Add backend directory to sys.path to allow imports
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from app.services.sync_service import sync_service
+from app.services.sync_service import sync_service, SYNC_MODE_FULL, SYNC_MODE_INCREMENTAL
+from app.services.sync_scheduler import sync_lock
+from app.core.config import settings
 
 if __name__ == "__main__":
-    print("Initializing Manual Sync (Forced)...")
-    success = sync_service.sync_all(force=True)
+    # --incremental: only re-pull cost centers changed on the ERP (no fingerprint: rows above the high-water mark)
+    mode = SYNC_MODE_INCREMENTAL if "--incremental" in sys.argv else SYNC_MODE_FULL
+    # --parallel: sync tables (and cost-center chunks) concurrently on a bounded thread pool
+    parallel = "--parallel" in sys.argv
+    # --resume: continue an interrupted run from its last committed cost-center chunk
+    resume = "--resume" in sys.argv
+    print(f"Initializing Manual Sync (Forced, mode={mode}, parallel={parallel}, resume={resume})...")
+    if settings.CACHE_BACKEND == "sqlite":
+        # The API workers share the SQLite cache: invalidate and re-warm it once the tables are synced
+        from app.services.cache_refresh_service import CacheRefreshService
+        sync_service.add_completion_listener(lambda tables: CacheRefreshService.on_sync_completed(tables, background=False))
+    # Same lock as the API's sync scheduler: never two syncs at once
+    with sync_lock.hold() as acquired:
+        if not acquired:
+            print("Another sync is running (API scheduler or another sync_tables.py). Try again later.")
+            sys.exit(1)
+        # If the lease can't be renewed, finish the tables already running and start no others
+        success = sync_service.sync_all(
+            force=True, mode=mode, parallel=parallel, resume=resume,
+            should_continue=lambda: not sync_lock.lost.is_set()
+        )
     if success:
         print("Sync finished successfully.")
         sys.exit(0)
     else:
         print("Sync failed.")
         sys.exit(1)
-
@@ -0,0 +1,11 @@
+import os
+import sys
+
+# Same as the scripts in backend/: make the "app" package importable
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Unit tests never touch the ERP or the local SQL Server: an empty server selects the SQLite
+# fallback engines (created lazily, never connected), so no ODBC driver is needed to import
+# app.db.session. Set before any "app" import; load_dotenv() doesn't override it.
+os.environ["DB_SERVER"] = ""
+os.environ["LOCAL_DB_SERVER"] = ""
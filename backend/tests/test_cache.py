@@ -0,0 +1,51 @@
+from app.core.cache import SimpleCache
+
+
+def test_lru_eviction_by_entry_count():
+    cache = SimpleCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "a" becomes the most recently used
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.evictions == 1
+
+
+def test_eviction_by_size_budget():
+    cache = SimpleCache(max_bytes=300)
+    cache.set("a", "x" * 100)
+    cache.set("b", "y" * 100)
+    cache.set("c", "z" * 100)
+    assert cache.get("a") is None
+    assert cache.get("c") == "z" * 100
+    assert cache.evictions >= 1
+
+
+def test_value_larger_than_budget_is_not_stored():
+    cache = SimpleCache(max_bytes=50)
+    cache.set("big", "x" * 100)
+    assert cache.get("big") is None
+    assert cache.evictions == 0
+
+
+def test_invalidate_tags():
+    cache = SimpleCache()
+    cache.set("a", 1, tags=["table:CTT010"])
+    cache.set("b", 2, tags=["table:SE2010"])
+    assert cache.invalidate_tags("table:CTT010") == 1
+    assert cache.get("a") is None and cache.get("b") == 2
+
+
+def test_bypass_computes_without_inner_entries():
+    cache = SimpleCache()
+    cache.set("inner", "old")
+
+    def outer():
+        with cache.bypass():
+            return cache.get_or_compute("inner", lambda: "new") + "!"
+
+    assert cache.get_or_compute("outer", outer) == "new!"
+    assert cache.get("inner") == "old"  # Neither read nor replaced inside the block
+    assert cache.get("outer") == "new!"
+    assert cache.get_or_compute("inner", lambda: "other") == "old"
@@ -0,0 +1,18 @@
+import pytest
+from fastapi import HTTPException
+
+from app.core.pagination import encode_cursor, decode_cursor
+
+
+@pytest.mark.parametrize("value", [["001010167", 1234], "001010167", "", "Conceição / 50%", 42, None])
+def test_cursor_round_trip(value):
+    cursor = encode_cursor(value)
+    assert "=" not in cursor  # Padding stripped: safe in a query string
+    assert decode_cursor(cursor) == value
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor!", "e30", encode_cursor("x")[:-3] + "@@@"])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+    assert error.value.status_code == 400
@@ -0,0 +1,12 @@
+from app.services.project_search_service import tokenize, normalize_text, TOKEN_MAX_LENGTH
+
+
+def test_normalize_text():
+    assert normalize_text("Conceição ÁGUA") == "conceicao agua"
+    assert normalize_text(None) == ""
+
+
+def test_tokenize():
+    assert tokenize("Projeto Água-Viva / 2026") == ["projeto", "agua", "viva", "2026"]
+    assert tokenize("  ") == []
+    assert tokenize("x" * 80) == ["x" * TOKEN_MAX_LENGTH]
@@ -0,0 +1,56 @@
+"""Status de um projeto: um único bucket por projeto, na ordem de prioridade do dashboard."""
+from datetime import date
+
+import pytest
+
+from app.services.project_summary_service import project_status, status_fields
+
+TODAY = "20261016"
+
+
+@pytest.mark.parametrize("dtini, dtfim, dtenc, is_finalized, expected", [
+    # Finalizado vence tudo, até datas inválidas
+    ("20260101", "20261231", "", True, "finalized"),
+    ("", "", "", True, "finalized"),
+    # Em execução (limites inclusivos), mesmo se encerrado no ERP
+    ("20260101", "20261231", "", False, "in_execution"),
+    (TODAY, TODAY, "", False, "in_execution"),
+    ("20260101", "20261231", "20260301", False, "in_execution"),
+    # Encerrado no ERP fora da vigência vence prestar contas e não iniciado
+    ("20250101", "20251231", "20260101", False, "closed"),
+    ("20270101", "20271231", TODAY, False, "closed"),
+    # Encerramento futuro ou inválido não conta
+    ("20250101", "20251231", "20270101", False, "rendering_accounts"),
+    ("20250101", "20251231", "2026", False, "rendering_accounts"),
+    ("20270101", "20271231", "", False, "not_started"),
+    ("20270101", "20271231", "20270601", False, "not_started"),
+    # Datas invertidas: já terminou, então presta contas
+    ("20270101", "20250101", "", False, "rendering_accounts"),
+    # Datas inválidas
+    ("", "20261231", "", False, None),
+    ("2026010", "20261231", "", False, None),
+    (None, None, None, False, None),
+])
+def test_project_status(dtini, dtfim, dtenc, is_finalized, expected):
+    assert project_status(dtini, dtfim, dtenc, is_finalized, TODAY) == expected
+
+
+def test_project_status_ignores_char_padding():
+    assert project_status("20260101  ", " 20261231", "        ", False, TODAY) == "in_execution"
+    assert project_status("20250101", "20251231", "20260101  ", False, TODAY) == "closed"
+
+
+def test_status_fields():
+    fields = status_fields("20260101", "20261031", "", False, date(2026, 10, 16))
+    assert fields == {
+        "days_remaining": 15,
+        "status": "in_execution",
+        "is_finalized": False,
+        "computed_on": "20261016"
+    }
+
+
+def test_status_fields_invalid_end_date():
+    fields = status_fields("20260101", "", "", True, date(2026, 10, 16))
+    assert fields["days_remaining"] is None
+    assert fields["status"] == "finalized"
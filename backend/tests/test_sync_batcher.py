@@ -0,0 +1,159 @@
+import sqlite3
+
+from app.services.sync_batcher import AdaptiveBatcher, SQLSERVER_MAX_PARAMS, dbapi_savepoint, open_transaction_count
+
+
+class FakeTable:
+    """executemany that, like the drivers, keeps the rows before the one that fails."""
+
+    def __init__(self, bad):
+        self.rows = set()
+        self.bad = bad
+        self.pending = []
+
+    def execute_many(self, batch):
+        for row in batch:
+            if row in self.bad or row in self.rows or row in self.pending:
+                raise ValueError(f"bad row {row}")
+            self.pending.append(row)
+
+    def commit(self):
+        self.rows.update(self.pending)
+        self.pending = []
+
+    def savepoint(self):
+        table = self
+
+        class Savepoint:
+            def __enter__(self):
+                self.mark = len(table.pending)
+
+            def __exit__(self, exc_type, exc, tb):
+                if exc_type is not None:
+                    del table.pending[self.mark:]
+                return False
+        return Savepoint()
+
+
+def test_initial_size_respects_parameter_limit():
+    batcher = AdaptiveBatcher(column_count=40)
+    assert batcher.size * 40 < SQLSERVER_MAX_PARAMS
+
+
+def test_bisection_isolates_bad_rows():
+    table = FakeTable(bad={7, 13})
+    batcher = AdaptiveBatcher(column_count=1)
+    batcher.size = 20
+    written = batcher.insert_all(list(range(20)), table.execute_many, savepoint=table.savepoint)
+    table.commit()
+    assert written == 18
+    assert batcher.bad_rows == 2
+    assert table.rows == set(range(20)) - {7, 13}
+
+
+
+class FakeSqlServer:
+    """
+    pyodbc connection with autocommit off (IMPLICIT_TRANSACTIONS ON): the first statement that
+    touches a table opens a transaction, BEGIN TRANSACTION at @@TRANCOUNT = 0 opens two, and
+    commit() closes one.
+    """
+
+    def __init__(self, bad):
+        self.trancount = 0
+        self.bad = bad
+        self.committed = []
+        self.pending = []
+        self.savepoints = []
+
+    def cursor(self):
+        return FakeSqlServerCursor(self)
+
+    def commit(self):
+        self.trancount -= 1
+        if self.trancount == 0:
+            self.committed.extend(self.pending)
+            self.pending = []
+
+    def rollback(self):
+        self.trancount = 0
+        self.pending = []
+
+
+class FakeSqlServerCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.result = []
+
+    def _touch_table(self):
+        if self.conn.trancount == 0:
+            self.conn.trancount = 1
+
+    def execute(self, sql, params=()):
+        conn = self.conn
+        if sql == "SELECT @@TRANCOUNT":
+            self.result = [(conn.trancount,)]
+        elif sql.startswith("SELECT TOP (0) 1 FROM"):
+            self._touch_table()
+            self.result = []
+        elif sql == "BEGIN TRANSACTION":
+            conn.trancount += 2 if conn.trancount == 0 else 1
+        elif sql == "SAVE TRANSACTION sync_batch":
+            assert conn.trancount > 0, "SAVE TRANSACTION outside a transaction"
+            conn.savepoints.append(len(conn.pending))
+        elif sql == "ROLLBACK TRANSACTION sync_batch":
+            del conn.pending[conn.savepoints.pop():]
+        else:
+            raise AssertionError(f"unexpected statement {sql}")
+
+    def executemany(self, sql, rows):
+        self._touch_table()
+        for row in rows:
+            if row in self.conn.bad or row in self.conn.pending:
+                raise ValueError(f"bad row {row}")
+            self.conn.pending.append(row)
+
+    def fetchone(self):
+        return self.result[0]
+
+    def fetchall(self):
+        return self.result
+
+    def close(self):
+        pass
+
+
+def test_sqlserver_savepoint_keeps_a_single_transaction():
+    conn = FakeSqlServer(bad={5})
+    cursor = conn.cursor()
+    batcher = AdaptiveBatcher(column_count=1)
+    batcher.size = 10
+    written = batcher.insert_all(
+        list(range(10)),
+        lambda batch: cursor.executemany("INSERT", batch),
+        savepoint=dbapi_savepoint(conn, "mssql", "SE2010")
+    )
+    assert (written, batcher.bad_rows) == (9, 1)
+    assert open_transaction_count(conn) == 1
+    conn.commit()
+    assert conn.trancount == 0
+    assert sorted(conn.committed) == [0, 1, 2, 3, 4, 6, 7, 8, 9]
+
+
+def test_sqlite_savepoint_does_not_commit_the_chunk():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE T (id INTEGER PRIMARY KEY)")
+    conn.execute("INSERT INTO T VALUES (3)")
+    conn.commit()
+    cursor = conn.cursor()
+    batcher = AdaptiveBatcher(column_count=1)
+    batcher.size = 10
+    written = batcher.insert_all(
+        [(i,) for i in range(10)],
+        lambda batch: cursor.executemany("INSERT INTO T VALUES (?)", batch),
+        savepoint=dbapi_savepoint(conn, "sqlite", "T")
+    )
+    assert (written, batcher.bad_rows) == (9, 1)
+    assert conn.in_transaction
+    conn.rollback()  # Nothing was committed behind the chunk's back
+    assert conn.execute("SELECT COUNT(*) FROM T").fetchone()[0] == 1
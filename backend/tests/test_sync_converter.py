@@ -0,0 +1,34 @@
+from decimal import Decimal
+
+from app.services.sync_converter import RowConverter
+
+
+def test_convert_reorders_casts_and_trims():
+    converter = RowConverter(
+        source_columns=["E1_CUSTO", "E1_VALOR", "E1_NOTA", "R_E_C_N_O_"],
+        target_columns=["R_E_C_N_O_", "E1_CUSTO", "E1_VALOR", "E1_NUM", "E1_EXTRA"],
+        float_columns=["E1_VALOR"],
+        derived_columns={"E1_NUM": "E1_NOTA"},
+        trim_columns=["E1_CUSTO"]
+    )
+    rows = [
+        ("001010167   ", Decimal("10.50"), "000123", 1),
+        (None, "abc", "000124", 2),
+        ("  001010168", None, None, 3),
+    ]
+    assert converter.convert(rows) == [
+        (1, "001010167", 10.5, "000123", None),
+        (2, None, None, "000124", None),
+        (3, "001010168", None, None, None),
+    ]
+
+
+def test_convert_float_values_are_python_floats():
+    converter = RowConverter(["V"], ["V"], float_columns=["V"])
+    (value,), (infinite,) = converter.convert([(Decimal("1.25"),), (float("inf"),)])
+    assert type(value) is float and value == 1.25
+    assert infinite is None
+
+
+def test_convert_empty_batch():
+    assert RowConverter(["A"], ["A"], float_columns=[]).convert([]) == []
@@ -0,0 +1,53 @@
+import asyncio
+from datetime import timedelta
+
+from app.core.config import settings
+from app.services.sync_scheduler import SyncLock, SyncScheduler, parse_schedule
+
+
+def test_parse_schedule():
+    policies = parse_schedule("se2010=15m:incremental, SE2010=daily@03:00:full,,PAD010=daily@2:30:full")
+    assert policies == [
+        {"table_name": "SE2010", "mode": "incremental", "interval": timedelta(minutes=15), "daily_at": None},
+        {"table_name": "SE2010", "mode": "full", "interval": None, "daily_at": (3, 0)},
+        {"table_name": "PAD010", "mode": "full", "interval": None, "daily_at": (2, 30)},
+    ]
+
+
+def test_parse_schedule_skips_invalid_policies():
+    assert parse_schedule("SE2010=15:incremental,CTT010=60m:partial,SC6010=60m:full") == [
+        {"table_name": "SC6010", "mode": "full", "interval": timedelta(minutes=60), "daily_at": None},
+    ]
+    assert parse_schedule("") == []
+    assert parse_schedule(None) == []
+
+
+def test_failed_renewal_marks_the_lock_lost():
+    lock = SyncLock(name="test-renew")
+    lock.acquire = lambda: False  # Another owner took over the expired lease
+    assert lock.renew() is False
+    assert lock.lost.is_set()
+    lock.release()
+    assert not lock.lost.is_set()
+
+
+def test_scheduler_stops_after_the_current_job_when_the_lock_is_lost(monkeypatch):
+    from app.services.sync_service import sync_service
+
+    lock = SyncLock(name="test-scheduler")
+    lock.acquire = lambda: True
+    lock.release = lambda: None
+    scheduler = SyncScheduler([], lock)
+    jobs = [{"table_name": name, "mode": "full"} for name in ["CTT010", "SE2010", "SC6010"]]
+    monkeypatch.setattr(scheduler, "due_jobs", lambda: jobs)
+    monkeypatch.setattr(scheduler, "is_due", lambda job: True)
+    monkeypatch.setattr(settings, "SYNC_SCHEDULER_STAGGER_SECONDS", 0)
+    synced = []
+
+    def sync_all(force, mode, tables):
+        synced.extend(tables)
+        lock.lost.set()  # The lease renewal failed while this job ran
+
+    monkeypatch.setattr(sync_service, "sync_all", sync_all)
+    assert asyncio.run(scheduler.run_due_jobs()) == 1
+    assert synced == ["CTT010"]
@@ -184,33 +184,23 @@ export default function ProjectsPage() {
             // para que os counts mostrem todas as opções disponíveis no período
 
             // Buscar todos os projetos fazendo múltiplas requisições se necessário
+            // (paginação por cursor: cada página custa o mesmo, sem recontar o total)
             const allProjects: Project[] = [];
-            let currentPage = 1;
             const limit = 1000; // Limite por página
-            let hasMore = true;
+            let cursor: string | null = null;
 
-            while (hasMore) {
+            do {
                 const pageParams = new URLSearchParams(params);
-                pageParams.append('page', currentPage.toString());
                 pageParams.append('limit', limit.toString());
+                pageParams.append('include_total', 'false');
+                if (cursor) pageParams.append('after', cursor);
 
                 const res = await api.get(`/projects?${pageParams.toString()}`);
-                const pageData = res.data;
-
-                if (pageData.data && pageData.data.length > 0) {
-                    allProjects.push(...pageData.data);
-
-                    // Verificar se há mais páginas
-                    const totalPages = pageData.total_pages || 1;
-                    if (currentPage >= totalPages || pageData.data.length < limit) {
-                        hasMore = false;
-                    } else {
-                        currentPage++;
-                    }
-                } else {
-                    hasMore = false;
-                }
-            }
+                const pageData: PaginatedResponse<Project> = res.data;
+
+                allProjects.push(...(pageData.data || []));
+                cursor = pageData.has_more ? pageData.next_cursor ?? null : null;
+            } while (cursor);
 
             return {
                 data: allProjects,
@@ -328,8 +318,9 @@ export default function ProjectsPage() {
         return result;
     }, [allProjects, filters, activeUrgencyFilter, activePreset]);
 
-    const totalPages = data?.total_pages || 1;
-    const totalItems = data?.total || 0;
+    // total/total_pages are null when the count was skipped (include_total=false)
+    const totalPages = data?.total_pages ?? 1;
+    const totalItems = data?.total ?? filteredProjects.length;
 
     // Calcular counts com todos os projetos (sem filtros de coordenador, cliente, classificação, tipo)
     // Isso garante que os counts sejam precisos mesmo quando há filtros ativos
@@ -107,10 +107,12 @@ export interface ProjectStats {
 
 export interface PaginatedResponse<T> {
     data: T[];
-    total: number;
+    total: number | null; // null com include_total=false (contagem dispensada)
     page: number;
     limit: number;
-    total_pages: number;
+    total_pages: number | null;
+    next_cursor?: string | null;
+    has_more?: boolean;
     stats?: ProjectStats;
 }
 